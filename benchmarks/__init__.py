@@ -0,0 +1,44 @@
+import random
+
+from graph import Graph, Node
+from timing import timed  # noqa: F401 re-exported for the benchmarks
+
+
+def random_dag(node_count: int, fan_out: int = 2, window: int = 1000, seed: int = 0) -> Graph:
+    """
+    Random DAG where node `i` has up to `fan_out` children among the next `window` nodes.
+    Node 0 is the root and every other node is reachable from it.
+    """
+    rng = random.Random(seed)
+    nodes = [Node() for _ in range(node_count)]
+    for i, node in enumerate(nodes[:-1]):
+        node.add_child(nodes[i + 1])
+        for _ in range(fan_out - 1):
+            node.add_child(nodes[rng.randint(i + 1, min(i + window, node_count - 1))])
+
+    return Graph(nodes[0])
+
+
+def single_leaf_dag(node_count: int, max_children: int = 3, window: int = 1000, seed: int = 0) -> Graph:
+    """
+    Random DAG grown upward from a single leaf: every new node gets 1 to `max_children` children
+    among the last `window` nodes. Nodes that nobody picked are the roots. The returned graph is rooted at the leaf.
+    """
+    rng = random.Random(seed)
+    nodes = [Node()]
+    for _ in range(node_count - 1):
+        node = Node()
+        candidates = nodes[-window:]
+        for child in rng.sample(candidates, min(len(candidates), rng.randint(1, max_children))):
+            node.add_child(child)
+        nodes.append(node)
+
+    return Graph(nodes[0])
+
+
+def chain(node_count: int) -> Graph:
+    nodes = [Node() for _ in range(node_count)]
+    for parent, child in zip(nodes, nodes[1:]):
+        parent.add_child(child)
+
+    return Graph(nodes[0])
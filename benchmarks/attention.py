@@ -0,0 +1,45 @@
+import argparse
+import time
+
+import torch
+
+from models.spectral_ar_vit import SpectralMultiheadAttention, create_attention_mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dense and tiled spectral attention on CPU, with the spiral layer mask.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64, 96], help='spectrum heights, widths are h // 2 + 1')
+    parser.add_argument('--hidden-dim', type=int, default=64)
+    parser.add_argument('--heads', type=int, default=4)
+    parser.add_argument('--block-size', type=int, default=128)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    attention = SpectralMultiheadAttention(args.hidden_dim, args.heads, dropout=0, block_size=args.block_size).eval()
+
+    print(f'{"tokens":>8} {"dense":>10} {"tiled":>10} {"speedup":>8} {"max error":>10}')
+    for h in args.sizes:
+        w = h // 2 + 1
+        x = torch.randn(1, h * w, args.hidden_dim, dtype=torch.complex64)
+        dense_mask = create_attention_mask(h, w)
+        sparse_mask = create_attention_mask(h, w, form='sparse')
+
+        results = {}
+        outputs = {}
+        for tiled, mask in ((False, dense_mask), (True, sparse_mask)):
+            attention.tiled = tiled
+            with torch.no_grad():
+                outputs[tiled] = attention(x, mask)
+                start = time.perf_counter()
+                for _ in range(args.repeats):
+                    attention(x, mask)
+            results[tiled] = (time.perf_counter() - start) / args.repeats
+
+        error = (outputs[True] - outputs[False]).abs().max().item()
+        assert error < 1e-3, (h, error)
+        print(f'{h * w:>8} {results[False]:10.4f} {results[True]:10.4f} {results[False] / results[True]:7.2f}x {error:10.2e}')
+
+
+if __name__ == '__main__':
+    main()
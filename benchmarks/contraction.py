@@ -0,0 +1,88 @@
+import argparse
+import random
+
+from graph import Graph, Node, hashing
+from graph.compact import CompactGraph
+from . import timed
+
+
+def chained_dag(node_count: int, chain_length: int = 8, seed: int = 0) -> Graph:
+    """
+    DAG made of single-parent/single-child runs of `chain_length` nodes, like linear runs of autograd functions.
+    The last node of every run feeds the next run and, sometimes, a random later run.
+    """
+    rng = random.Random(seed)
+    nodes = [Node() for _ in range(node_count)]
+    heads = list(range(0, node_count, chain_length))
+    for i, head in enumerate(heads):
+        last = min(head + chain_length, node_count) - 1
+        for j in range(head, last):
+            nodes[j].add_child(nodes[j + 1])
+        if i + 1 < len(heads):
+            nodes[last].add_child(nodes[heads[i + 1]])
+        if i + 2 < len(heads) and rng.random() < 0.5:
+            nodes[last].add_child(nodes[heads[rng.randint(i + 2, len(heads) - 1)]])
+
+    return Graph(nodes[0])
+
+
+def legacy_regular_2(graph: Graph) -> Graph:
+    node_map = graph.copy_map()
+    reverse_map = {
+        v: k
+        for k, v in node_map.items()
+    }
+
+    for node in node_map.values():
+        if len(node.parents) == 1 and len(next(iter(node.parents)).children) == 1:
+            parent = next(iter(node.parents))
+            for child in node.children:
+                child.add_parent(parent)
+
+            node_map[reverse_map[node]] = parent
+            node.remove(keep_self=True)
+
+        elif len(node.children) == 1 and len(next(iter(node.children)).parents) == 1:
+            child = next(iter(node.children))
+            for parent in node.parents:
+                parent.add_child(child)
+
+            node_map[reverse_map[node]] = child
+            node.remove(keep_self=True)
+
+    # the root may have been merged into a node that was merged in turn, so it is followed to its final representative,
+    # where the original pass returned the stale one
+    root = node_map[graph.root]
+    while node_map[reverse_map[root]] is not root:
+        root = node_map[reverse_map[root]]
+
+    return Graph(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy regular_2 pass with the single-sweep chain contraction.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6])
+    parser.add_argument('--chain-length', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f'{"nodes":>10} {"legacy":>10} {"regular_2":>10} {"compact":>10} {"speedup":>8}')
+    for size in args.sizes:
+        graph = chained_dag(size, args.chain_length)
+        compact = CompactGraph.from_graph(graph)
+        results = {}
+
+        with timed(results, 'legacy'):
+            legacy = legacy_regular_2(graph)
+        with timed(results, 'regular_2'):
+            contracted = graph.regular_2()
+        with timed(results, 'compact'):
+            compact_contracted = compact.regular_2()
+
+        assert legacy == contracted
+        assert hashing.are_isomorphic(contracted, compact_contracted)
+
+        print(f'{size:>10} {results["legacy"]:10.3f} {results["regular_2"]:10.3f} {results["compact"]:10.3f} {results["legacy"] / results["regular_2"]:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import copy
+import io
+import pickle
+import random
+import sys
+
+from graph import hashing
+from graph.binary import read_json_compact
+from graph.compact import CompactGraph
+from graph.passes import PassManager
+from graph.serialization import read_json, write_json
+from ops import exclusive_split
+from . import chain, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every traversal, copy and comparison on a deep chain, at the default recursion limit.')
+    parser.add_argument('--size', type=int, default=10**6)
+    args = parser.parse_args()
+
+    limit = sys.getrecursionlimit()
+    graph = chain(args.size)
+    results = {}
+
+    with timed(results, 'get_nodes'):
+        graph.get_nodes()
+    with timed(results, 'topological_order'):
+        for _ in graph.topological_order():
+            pass
+    with timed(results, 'copy_map'):
+        graph.copy_map()
+    with timed(results, 'deepcopy'):
+        twin = copy.deepcopy(graph)
+    with timed(results, 'pickle'):
+        pickle.loads(pickle.dumps(graph))
+    with timed(results, 'are_isomorphic'):
+        assert hashing.are_isomorphic(graph, twin)
+    with timed(results, 'regular_2'):
+        graph.regular_2()
+    with timed(results, 'passes'):
+        PassManager(['regular_2', 'reverse_connections', 'unique_indexes'], counters=False).run(graph)
+    with timed(results, 'exclusive_split'):
+        exclusive_split(graph, 2, random.Random(0))
+    with timed(results, 'compact'):
+        compact = CompactGraph.from_graph(graph)
+        compact.regular_2()
+        compact.reverse_connections()
+
+    data = io.StringIO()
+    with timed(results, 'write_json'):
+        write_json(graph, data)
+    with timed(results, 'read_json'):
+        data.seek(0)
+        read_json(data)
+    with timed(results, 'read_json_compact'):
+        data.seek(0)
+        read_json_compact(data)
+
+    assert sys.getrecursionlimit() == limit
+    print(f'{args.size} node chain, recursion limit {limit}')
+    for key, seconds in results.items():
+        print(f'{key:>20} {seconds:10.3f}')
+
+
+if __name__ == '__main__':
+    main()
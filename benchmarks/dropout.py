@@ -0,0 +1,74 @@
+import argparse
+import time
+
+import torch
+
+from models.spectral_ar_vit import SpectralDropout, SpectralSoftplus
+
+
+def legacy_spectral_dropout(x: torch.Tensor, p: float) -> torch.Tensor:
+    """
+    Previous `spectral_dropout`, which also dropped in eval mode.
+    """
+    magnitude = torch.nn.functional.dropout(x.abs(), p)
+    phase = torch.nn.functional.dropout(x.angle(), p)
+    return torch.complex(magnitude * torch.cos(phase), magnitude * torch.sin(phase))
+
+
+def legacy_softplus(x: torch.Tensor, beta: float, threshold: float) -> torch.Tensor:
+    softplus = torch.nn.Softplus(beta=beta, threshold=threshold)
+    return softplus(x.real) + 1j * softplus(x.imag)
+
+
+def statistics(y: torch.Tensor) -> tuple:
+    """
+    Share of dropped magnitudes, share of dropped phases among the kept magnitudes, and mean magnitude.
+    """
+    kept = y != 0
+    return (~kept).float().mean().item(), (y.imag[kept] == 0).float().mean().item(), y.abs().mean().item()
+
+
+def measure(function, x: torch.Tensor, repeats: int) -> float:
+    start = time.perf_counter()
+    with torch.no_grad():
+        for _ in range(repeats):
+            function(x)
+
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the fused spectral dropout and softplus to the versions they replaced, in train and eval mode.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2**16, 2**20, 2**22])
+    parser.add_argument('--p', type=float, default=0.5)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    dropout = SpectralDropout(args.p)
+    softplus = SpectralSoftplus(beta=8, threshold=1)
+
+    print(f'{"elements":>9} {"mode":>5} {"legacy":>10} {"fused":>10} {"speedup":>8}')
+    for size in args.sizes:
+        x = torch.randn(size, dtype=torch.complex64)
+
+        dropout.train()
+        fused, legacy = statistics(dropout(x)), statistics(legacy_spectral_dropout(x, args.p))
+        for a, b in zip(fused, legacy):
+            assert abs(a - b) < 0.02, (size, fused, legacy)
+        times = measure(lambda t: legacy_spectral_dropout(t, args.p), x, args.repeats), measure(dropout, x, args.repeats)
+        print(f'{size:>9} {"train":>5} {times[0]:10.5f} {times[1]:10.5f} {times[0] / times[1]:7.2f}x')
+
+        dropout.eval()
+        assert dropout(x) is x
+        # the legacy version did the same work in eval mode
+        times = measure(lambda t: legacy_spectral_dropout(t, args.p), x, args.repeats), measure(dropout, x, args.repeats)
+        print(f'{size:>9} {"eval":>5} {times[0]:10.5f} {times[1]:10.5f} {times[0] / times[1]:7.2f}x')
+
+        assert torch.allclose(softplus(x), legacy_softplus(x, 8, 1))
+        times = measure(lambda t: legacy_softplus(t, 8, 1), x, args.repeats), measure(softplus, x, args.repeats)
+        print(f'{size:>9} {"soft+":>5} {times[0]:10.5f} {times[1]:10.5f} {times[0] / times[1]:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import time
+
+import torch
+
+from models.spectral_ar_vit import ArSpectralDiffusionTransformer, create_attention_mask
+
+
+def stepped(model, x, layers_per_step: int):
+    """
+    Run the spectrum `x` through `step`, `layers_per_step` spiral layers at a time, and put the outputs back in grid order.
+    """
+    b, h, w, c = x.shape
+    state = model.start_generation(h, w)
+    tokens = x.reshape(b, h * w, c)[:, state.u_ids]
+    bounds = state.layer_bounds()
+    outputs = []
+    for i in range(0, len(bounds), layers_per_step):
+        start, end = bounds[i][0], bounds[min(i + layers_per_step, len(bounds)) - 1][1]
+        outputs.append(model.step(tokens[:, start:end], state))
+
+    y = torch.cat(outputs, dim=1)
+    return y[:, torch.argsort(state.u_ids)].reshape(b, h, w, -1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that KV-cached generation matches the masked forward pass, and time both.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 16, 32], help='spectrum heights, widths are h // 2 + 1')
+    parser.add_argument('--layers-per-step', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--hidden-dim', type=int, default=32)
+    parser.add_argument('--blocks', type=int, default=2)
+    parser.add_argument('--tiled', action='store_true')
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = ArSpectralDiffusionTransformer(hidden_dim=args.hidden_dim, heads=4, blocks=args.blocks, tiled=args.tiled, block_size=16).eval()
+
+    print(f'{"tokens":>7} {"layers/step":>11} {"forward":>9} {"steps":>9} {"max error":>10}')
+    for h in args.sizes:
+        w = h // 2 + 1
+        x = torch.randn(1, h, w, 4, dtype=torch.complex64)
+        with torch.no_grad():
+            start = time.perf_counter()
+            expected = model(x, create_attention_mask(h, w, form='sparse' if args.tiled else 'bool'))
+            forward_time = time.perf_counter() - start
+
+            for layers_per_step in args.layers_per_step:
+                start = time.perf_counter()
+                y = stepped(model, x, layers_per_step)
+                step_time = time.perf_counter() - start
+                error = (y - expected).abs().max().item()
+                assert error < 1e-3, (h, layers_per_step, error)
+                print(f'{h * w:>7} {layers_per_step:>11} {forward_time:9.4f} {step_time:9.4f} {error:10.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import itertools
+import random
+import time
+
+from graph import Graph, Node, hashing
+
+
+def random_edges(rng: random.Random, node_count: int, extra_edges: int) -> set:
+    """
+    Edges of a random weakly connected DAG over `0..node_count - 1`, topologically numbered.
+    """
+    edges = {(rng.randrange(i), i) for i in range(1, node_count)}
+    for _ in range(extra_edges):
+        parent, child = sorted(rng.sample(range(node_count), 2))
+        edges.add((parent, child))
+
+    return edges
+
+
+def build(node_count: int, edges: set, root: int) -> Graph:
+    nodes = [Node() for _ in range(node_count)]
+    for parent, child in edges:
+        nodes[parent].add_child(nodes[child])
+
+    return Graph(nodes[root])
+
+
+def brute_force(node_count: int, edges1: set, root1: int, edges2: set, root2: int) -> bool:
+    """
+    Try every bijection mapping root to root.
+    """
+    if len(edges1) != len(edges2):
+        return False
+
+    others1 = [i for i in range(node_count) if i != root1]
+    others2 = [i for i in range(node_count) if i != root2]
+    for permutation in itertools.permutations(others2):
+        mapping = {root1: root2, **dict(zip(others1, permutation))}
+        if all((mapping[parent], mapping[child]) in edges2 for parent, child in edges1):
+            return True
+
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check are_isomorphic and structural_hash against a brute-force permutation search on random small DAG pairs.')
+    parser.add_argument('--pairs', type=int, default=2000)
+    parser.add_argument('--max-nodes', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    counts = {True: 0, False: 0}
+    start = time.perf_counter()
+    for _ in range(args.pairs):
+        node_count = rng.randint(2, args.max_nodes)
+        extra_edges = rng.randint(0, node_count)
+        edges1 = random_edges(rng, node_count, extra_edges)
+        root1 = rng.randrange(node_count)
+
+        if rng.random() < 0.5:
+            # relabelled copy, with one edge moved half of the time
+            edges2 = set(edges1)
+            if rng.random() < 0.5:
+                edges2.discard(rng.choice(sorted(edges2)))
+                edges2.add(tuple(sorted(rng.sample(range(node_count), 2))))
+            permutation = list(range(node_count))
+            rng.shuffle(permutation)
+            edges2 = {(permutation[parent], permutation[child]) for parent, child in edges2}
+            root2 = permutation[root1]
+        else:
+            edges2 = random_edges(rng, node_count, extra_edges)
+            root2 = rng.randrange(node_count)
+
+        expected = brute_force(node_count, edges1, root1, edges2, root2)
+        graph1, graph2 = build(node_count, edges1, root1), build(node_count, edges2, root2)
+        assert hashing.are_isomorphic(graph1, graph2) == expected, (node_count, edges1, root1, edges2, root2)
+        assert (graph1 == graph2) == expected
+        if expected:
+            assert graph1.structural_hash() == graph2.structural_hash()
+        counts[expected] += 1
+
+    print(f'{args.pairs} pairs agree with brute force ({counts[True]} isomorphic, {counts[False]} not) in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
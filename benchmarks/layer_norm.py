@@ -0,0 +1,80 @@
+import argparse
+import time
+
+import torch
+
+from models.spectral_ar_vit import SpectralLayerNorm
+
+
+def legacy_layer_norm(norm: SpectralLayerNorm, x: torch.Tensor) -> torch.Tensor:
+    """
+    Previous `SpectralLayerNorm.forward`: eigendecomposition of every 2x2 covariance, and gamma repeated per token.
+    """
+    b, s, d = x.shape
+    x = x - x.mean(dim=-1, keepdim=True)
+    var = torch.bmm(
+        torch.view_as_real(x).transpose(-2, -1).reshape(b * s, 2, d),
+        torch.view_as_real(x).reshape(b * s, d, 2)
+    ) / (d - 1)
+
+    eigen_vals, eigen_vecs = torch.linalg.eigh(var + torch.diag(torch.tensor([norm.eps] * 2, device=x.device)))
+    eigen_vals = 1 / torch.sqrt(eigen_vals)
+    std_inv = torch.bmm(torch.bmm(eigen_vecs, torch.diag_embed(eigen_vals)), torch.linalg.inv(eigen_vecs))
+
+    x = torch.bmm(std_inv, torch.view_as_real(x).transpose(-2, -1).flatten(end_dim=1))
+    gamma = torch.stack([norm.gamma[:, :2], norm.gamma[:, 1:]], dim=-1).repeat(b * s, 1, 1)
+    x = torch.view_as_complex((gamma @ x.permute(2, 0, 1).reshape(d * b * s, 2, 1)).reshape(d, b * s, 2).permute(1, 0, 2).contiguous()) + norm.beta
+    return x.view(b, s, d)
+
+
+def measure(function, x: torch.Tensor, repeats: int, backward: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        if backward:
+            function(x).abs().sum().backward()
+        else:
+            with torch.no_grad():
+                function(x)
+
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the closed-form spectral layer norm to the eigendecomposition it replaced, on CPU.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--sequence-lengths', type=int, nargs='+', default=[256, 1024, 4096])
+    parser.add_argument('--hidden-dim', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--backward', action='store_true', help='time forward and backward')
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    # one gamma row shared by every feature, the only case the legacy version indexed correctly
+    norm = SpectralLayerNorm(args.hidden_dim)
+    recompute = SpectralLayerNorm(args.hidden_dim, recompute=True)
+    with torch.no_grad():
+        norm.gamma.copy_(torch.randn(1, 3).repeat(args.hidden_dim, 1))
+        norm.beta.copy_(torch.randn(args.hidden_dim, dtype=torch.complex64))
+    recompute.load_state_dict(norm.state_dict())
+
+    x = torch.randn(2, 16, args.hidden_dim, dtype=torch.complex64, requires_grad=True)
+    gradients = [torch.autograd.grad(module(x).abs().sum(), (x, module.gamma)) for module in (norm, recompute)]
+    for closed, recomputed in zip(*gradients):
+        assert torch.allclose(closed, recomputed, atol=1e-5), 'recomputed gradients differ'
+
+    print(f'{"batch":>6} {"tokens":>7} {"legacy":>10} {"closed":>10} {"recompute":>10} {"speedup":>8} {"max error":>10}')
+    for b in args.batch_sizes:
+        for s in args.sequence_lengths:
+            x = torch.randn(b, s, args.hidden_dim, dtype=torch.complex64, requires_grad=args.backward)
+            with torch.no_grad():
+                error = (norm(x) - legacy_layer_norm(norm, x)).abs().max().item()
+            assert error < 1e-3, (b, s, error)
+
+            legacy = measure(lambda t: legacy_layer_norm(norm, t), x, args.repeats, args.backward)
+            closed = measure(norm, x, args.repeats, args.backward)
+            recomputed = measure(recompute, x, args.repeats, args.backward)
+            print(f'{b:>6} {s:>7} {legacy:10.4f} {closed:10.4f} {recomputed:10.4f} {legacy / closed:7.2f}x {error:10.2e}')
+
+
+if __name__ == '__main__':
+    main()
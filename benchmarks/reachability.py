@@ -0,0 +1,81 @@
+import argparse
+import random
+import time
+
+from graph import Graph
+from graph.reachability import ReachabilityIndex
+from ops.node_split import split_node
+from . import single_leaf_dag
+
+
+def reachable(starts: list, neighbors, removed=None) -> set:
+    seen = {node for node in starts if node is not removed}
+    stack = list(seen)
+    while stack:
+        for n in neighbors(stack.pop()):
+            if n is not removed and n not in seen:
+                seen.add(n)
+                stack.append(n)
+
+    return seen
+
+
+def check(graph: Graph, index: ReachabilityIndex) -> None:
+    """
+    Compare every query of `index` with a walk of `graph`: a node dominates another when removing it
+    disconnects the other from every root, and post-dominates it when removing it disconnects the other from every leaf.
+    """
+    nodes = graph.get_nodes()
+    roots = [node for node in nodes if not node.parents]
+    leaves = [node for node in nodes if not node.children]
+    parents, children = (lambda node: node.parents), (lambda node: node.children)
+    assert set(index.roots) == set(roots)
+
+    for node in nodes:
+        ancestors = reachable([node], parents)
+        descendants = reachable([node], children)
+        assert set(index.roots_reaching(node)) == ancestors & set(roots)
+        assert index.root_count(node) == len(ancestors & set(roots))
+        assert index.ancestor_count(node) == len(ancestors) - 1
+        assert index.descendant_count(node) == len(descendants) - 1
+
+    for removed in nodes:
+        from_roots = reachable(roots, children, removed)
+        to_leaves = reachable(leaves, parents, removed)
+        for node in nodes:
+            if node is not removed:
+                assert index.dominates(removed, node) == (node not in from_roots), (removed, node)
+                assert index.post_dominates(removed, node) == (node not in to_leaves), (removed, node)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check ReachabilityIndex against brute-force reachability and dominators on random graphs, through splits and chain contraction.')
+    parser.add_argument('--graphs', type=int, default=200)
+    parser.add_argument('--max-nodes', type=int, default=30)
+    parser.add_argument('--splits', type=int, default=3, help='nodes split in every graph')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for i in range(args.graphs):
+        graph = single_leaf_dag(rng.randint(2, args.max_nodes), max_children=rng.randint(1, 3), seed=args.seed * args.graphs + i)
+        index = ReachabilityIndex(graph)
+        check(graph, index)
+
+        for _ in range(args.splits):
+            node = rng.choice(graph.get_nodes())
+            splits = split_node(node, 3, rng=rng)
+            if node is graph.root:
+                graph.root = splits[0]
+            index.split(node, splits)
+            check(graph, index)
+
+        contracted, projection = graph.regular_2(provenance=True)
+        check(contracted, index.contracted(contracted, projection))
+
+    print(f'{args.graphs} graphs agree with brute force through {args.splits} splits each and chain contraction, in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import time
+
+from graph import Graph, NodeRule
+from ops import ExclusiveSplit, exclusive_split
+from solvers import SOLVERS
+from . import single_leaf_dag
+
+
+MODEL_FIXTURES = {
+    'simple': ('models.simple', 'SimpleModel', {}, lambda torch: torch.randn(5, 4)),
+    'spectral': ('models.spectral_ar_vit', 'ArSpectralDiffusionTransformer', {'hidden_dim': 16, 'heads': 2, 'blocks': 2}, lambda torch: torch.rand(1, 32, 17, 4).to(torch.complex64)),
+}
+
+
+def build_fixture(fixture: str, size: int, seed: int) -> Graph:
+    """
+    `random` builds a seeded single-leaf DAG of `size` nodes, `rules:<path>` loads a node editor file
+    through `Graph.from_rules`, and `model:<name>` traces one of `MODEL_FIXTURES`.
+    """
+    if fixture == 'random':
+        return single_leaf_dag(size, seed=seed)
+
+    kind, _, name = fixture.partition(':')
+    if kind == 'rules':
+        with open(name) as rules_file:
+            rules = [NodeRule(id=int(i), children=node['children']) for i, node in json.load(rules_file).items()]
+        return Graph.from_rules(rules)
+
+    if kind == 'model':
+        import importlib
+        import torch
+        from ops.torch import computation_graph
+
+        module, model_class, kwargs, make_input = MODEL_FIXTURES[name]
+        torch.manual_seed(seed)
+        model = getattr(importlib.import_module(module), model_class)(**kwargs)
+        return computation_graph(model(make_input(torch)))
+
+    raise ValueError(f'unknown fixture {fixture!r}')
+
+
+def evaluate(split: ExclusiveSplit, mappings: list) -> dict:
+    """
+    Compare solver mappings with the ground truth: for every original root, the roots it became in A and in B.
+    """
+    expected = {
+        (frozenset(split.splits_a[node]), frozenset(split.splits_b[node]))
+        for node in split.splits_a
+        if not node.parents
+    }
+    # A and B number their nodes from 0 alike, so their copies are told apart by side
+    origins_a, origins_b = (
+        {copy: node for node, copies in splits.items() for copy in copies}
+        for splits in (split.splits_a, split.splits_b)
+    )
+    roots = sum(len(left) + len(right) for left, right in expected)
+
+    found = {(frozenset(m.left), frozenset(m.right)) for m in mappings}
+    consistent = sum(
+        {origins_a[n] for n in m.left} == {origins_b[n] for n in m.right}
+        for m in mappings
+    )
+    covered = sum(len(m.left) + len(m.right) for m in mappings)
+
+    return {
+        'exact': len(expected & found) / len(expected) if expected else 1.0,
+        'consistent': consistent / len(mappings) if mappings else 0.0,
+        'coverage': covered / roots if roots else 1.0,
+    }
+
+
+def run_task(task: dict) -> dict:
+    graph = build_fixture(task['fixture'], task['size'], task['seed'])
+    split = exclusive_split(graph, task['max_splits'], random.Random(task['seed']))
+
+    solver = SOLVERS[task['solver']]()
+    start = time.perf_counter()
+    mappings = solver.solve(split.graph_a, split.graph_b)
+    wall_time = time.perf_counter() - start
+
+    return {
+        **task,
+        'nodes': len(split.splits_a),
+        'nodes_a': len(split.graph_a.get_nodes()),
+        'nodes_b': len(split.graph_b.get_nodes()),
+        'wall_time': wall_time,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        **evaluate(split, mappings),
+    }
+
+
+def scaling(results: list) -> list:
+    """
+    Log-log slope of wall time against node count, per solver, fixture and `max_splits`.
+    """
+    curves = {}
+    for result in results:
+        key = (result['solver'], result['fixture'], result['max_splits'])
+        curves.setdefault(key, {}).setdefault(result['nodes'], []).append(result['wall_time'])
+
+    summary = []
+    for (solver, fixture, max_splits), points in curves.items():
+        xs = [math.log(nodes) for nodes in points]
+        ys = [math.log(max(sum(times) / len(times), 1e-9)) for times in points.values()]
+        slope = None
+        if len(xs) > 1 and max(xs) > min(xs):
+            mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+        summary.append({
+            'solver': solver,
+            'fixture': fixture,
+            'max_splits': max_splits,
+            'points': {nodes: sum(times) / len(times) for nodes, times in sorted(points.items())},
+            'slope': slope,
+        })
+
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every registered solver on seeded exclusive_subgraphs pairs.')
+    parser.add_argument('--solvers', nargs='+', default=sorted(SOLVERS))
+    parser.add_argument('--fixtures', nargs='+', default=['random', 'rules:node_editor/tree_structure.json'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**4, 5 * 10**4], help='node counts for the random fixture')
+    parser.add_argument('--max-splits', type=int, nargs='+', default=[2, 10])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='solver_benchmark.json')
+    args = parser.parse_args()
+
+    tasks = []
+    for fixture, max_splits, seed, solver in itertools.product(args.fixtures, args.max_splits, args.seeds, args.solvers):
+        for size in (args.sizes if fixture == 'random' else [None]):
+            tasks.append({'fixture': fixture, 'size': size, 'max_splits': max_splits, 'seed': seed, 'solver': solver})
+
+    # one task per worker process, so that peak RSS is measured per task
+    with ProcessPoolExecutor(max_workers=args.workers, max_tasks_per_child=1) as executor:
+        results = list(executor.map(run_task, tasks))
+
+    print(f'{"solver":>12} {"fixture":>40} {"splits":>6} {"nodes":>8} {"time":>9} {"rss MB":>8} {"exact":>6} {"consist":>7}')
+    for r in results:
+        print(f'{r["solver"]:>12} {r["fixture"]:>40} {r["max_splits"]:>6} {r["nodes"]:>8} {r["wall_time"]:9.4f} {r["peak_rss_kb"] / 1024:8.1f} {r["exact"]:6.2f} {r["consistent"]:7.2f}')
+
+    curves = scaling(results)
+    for curve in curves:
+        if curve['slope'] is not None:
+            print(f'{curve["solver"]} on {curve["fixture"]} (max_splits={curve["max_splits"]}): time ~ nodes^{curve["slope"]:.2f}')
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'results': results,
+            'scaling': curves,
+        }, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import torch
+
+from graph import hashing
+from models.simple import ThreeOperationModel
+from ops.torch import compact_computation_graph, computation_graph
+
+
+class SharedModel(torch.nn.Module):
+    """
+    Every step reuses its input three times and the same weights, so autograd functions are shared between branches.
+    """
+    def __init__(self, dim: int, depth: int):
+        super().__init__()
+        self.linear = torch.nn.Linear(dim, dim)
+        self.depth = depth
+
+    def forward(self, x):
+        for _ in range(self.depth):
+            y = self.linear(x)
+            x = torch.tanh(y) * y + torch.sigmoid(y)
+        return x.sum()
+
+
+class SquareModel(torch.nn.Module):
+    """
+    Ops that take the same input twice, which autograd lists twice in `next_functions`.
+    """
+    def __init__(self, dim: int):
+        super().__init__()
+        self.linear = torch.nn.Linear(dim, dim)
+
+    def forward(self, x):
+        y = self.linear(x)
+        return (y * y + (y + y)).sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that compact_computation_graph traces the same graph as computation_graph, and time both.')
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--dim', type=int, default=8)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    fixtures = [
+        ('three_operation', ThreeOperationModel(4, 8, 2), torch.randn(5, 4)),
+        ('square', SquareModel(args.dim), torch.randn(2, args.dim)),
+    ]
+    fixtures += [(f'shared:{depth}', SharedModel(args.dim, depth), torch.randn(2, args.dim)) for depth in args.depths]
+
+    print(f'{"model":>16} {"nodes":>8} {"graph":>9} {"compact":>9}')
+    for name, model, x in fixtures:
+        output = model(x)
+        start = time.perf_counter()
+        graph = computation_graph(output)
+        graph_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compact = compact_computation_graph(output)
+        compact_time = time.perf_counter() - start
+
+        # compared as a `CompactGraph`: converting it back to a `Graph` would drop duplicate edges
+        assert compact.edge_count == sum(len(node.children) for node in graph.get_nodes()), name
+        assert hashing.are_isomorphic(graph, compact, labelled=True), name
+        print(f'{name:>16} {len(compact):>8} {graph_time:9.4f} {compact_time:9.4f}')
+
+
+if __name__ == '__main__':
+    main()
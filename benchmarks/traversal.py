@@ -0,0 +1,60 @@
+import argparse
+
+from graph import Graph, Node
+from graph.compact import CompactGraph
+from . import random_dag, timed
+
+
+def legacy_get_nodes(graph: Graph) -> list:
+    stack: list[Node] = [graph.root]
+    visited: set[Node] = set()
+    result: list[Node] = []
+
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+        else:
+            result.append(node)
+
+        visited.add(node)
+        stack = [n for n in node.children if n not in visited] + stack
+        stack = [n for n in node.parents if n not in visited] + stack
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy get_nodes walk with the linear-time traversal.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6])
+    parser.add_argument('--window', type=int, default=1000)
+    parser.add_argument('--legacy-limit', type=int, default=10**6, help='skip the legacy walk above this node count')
+    args = parser.parse_args()
+
+    print(f'{"nodes":>10} {"legacy":>10} {"get_nodes":>10} {"compact":>10} {"topo":>10} {"speedup":>8}')
+    for size in args.sizes:
+        graph = random_dag(size, window=args.window)
+        compact = CompactGraph.from_graph(graph)
+        results = {}
+
+        with timed(results, 'get_nodes'):
+            nodes = graph.get_nodes()
+        with timed(results, 'compact'):
+            compact.get_indexes()
+        with timed(results, 'topo'):
+            for _ in graph.topological_order():
+                pass
+
+        if size <= args.legacy_limit:
+            with timed(results, 'legacy'):
+                assert legacy_get_nodes(graph) == nodes
+            legacy = f'{results["legacy"]:10.3f}'
+            speedup = f'{results["legacy"] / results["get_nodes"]:7.1f}x'
+        else:
+            legacy, speedup = f'{"skipped":>10}', f'{"-":>8}'
+
+        print(f'{size:>10} {legacy} {results["get_nodes"]:10.3f} {results["compact"]:10.3f} {results["topo"]:10.3f} {speedup}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
 from dataclasses import dataclass
+import itertools
 import json
+from typing import Iterator
+
+from . import hashing, traversal
+from .contraction import contract_chains
 
 
 @dataclass
@@ -8,7 +13,12 @@ class NodeRule:
     children: list
 
 
-node_index = 0
+# `next` on an `itertools.count` is a single atomic step, so threads never get the same index
+node_indexes = itertools.count()
+
+
+def next_node_index() -> int:
+    return next(node_indexes)
 
 
 @dataclass
@@ -18,12 +28,9 @@ class Node:
     uuid: str
 
     def __init__(self) -> None:
-        global node_index
-
         self.children = set()
         self.parents = set()
-        self.uuid = str(node_index)
-        node_index += 1
+        self.uuid = str(next_node_index())
 
     def __hash__(self) -> str:
         return hash(self.uuid)
@@ -81,98 +88,82 @@ class Graph:
         if not isinstance(other, Graph):
             return False
 
-        return self._are_equal(self.root, other.root, set())
+        return hashing.are_isomorphic(self, other)
 
-    def _are_equal(self, node1: Node, node2: Node, visited: set) -> bool:
-        if not isinstance(node1, Node) or not isinstance(node2, Node):
-            return False
+    def structural_hash(self, labelled=False) -> str:
+        return hashing.structural_hash(self, labelled)
 
-        if len(node1.children) != len(node2.children):
-            return False
+    def __reduce__(self):
+        """
+        Pickle and deep copy the graph as a flat list of nodes and edges.
+        Linked nodes would otherwise be walked recursively, and rehashed before their uuid is restored.
+        """
+        nodes = self.get_nodes()
+        indexes = {node: i for i, node in enumerate(nodes)}
+        states = [
+            (type(node), {key: value for key, value in node.__dict__.items() if key not in ('children', 'parents')})
+            for node in nodes
+        ]
+        edges = [(indexes[node], indexes[child]) for node in nodes for child in node.children]
+        return _rebuild_graph, (states, edges)
 
-        node1_id = id(node1)
-        if node1_id in visited:
-            return True
+    def serialize(self):
+        return '[' + ', '.join(node.serialize() for node in self.iter_nodes()) + ']'
 
-        visited.add(node1_id)
-        for child1 in node1.children:
-            if not any(self._are_equal(child1, child2, visited) for child2 in node2.children):
-                return False
+    def iter_nodes(self) -> Iterator:
+        return traversal.bfs(self.root, _reversed_children, _reversed_parents)
 
-        return True
+    def get_nodes(self) -> list:
+        return list(self.iter_nodes())
 
-    def serialize(self):
+    def topological_order(self) -> Iterator:
+        return traversal.topological_order(self.get_nodes(), _children, _parents)
+
+    def reverse_topological_order(self) -> Iterator:
+        return traversal.reverse_topological_order(self.get_nodes(), _children, _parents)
+    
+    def regular_2(self, provenance=False):
+        """
+        Collapse single-parent/single-child chains into one node each, in O(V+E).
+        With `provenance`, also return a map from every original node to the copy that represents it.
+        """
         nodes = self.get_nodes()
-        return json.dumps([
-            json.loads(node.serialize())
-            for node in nodes
-        ])
+        indexes = {node: i for i, node in enumerate(nodes)}
+        children = [[indexes[n] for n in node.children] for node in nodes]
+        parents = [[indexes[n] for n in node.parents] for node in nodes]
+        representatives, _, tails = contract_chains(range(len(nodes)), children.__getitem__, parents.__getitem__)
 
-    def get_nodes(self) -> list:
-        stack: list[Node] = [self.root]
-        visited: set[Node] = set()
-        result: list[Node] = []
-
-        while stack:
-            node = stack.pop()
-            if node in visited:
-                continue
-            else:
-                result.append(node)
-            
-            visited.add(node)
-            stack = [n for n in node.children if n not in visited] + stack
-            stack = [n for n in node.parents if n not in visited] + stack
+        copies = {i: copy_node(nodes[i]) for i in tails}
+        for i, copy in copies.items():
+            for child in children[tails[i]]:
+                copy.add_child(copies[representatives[child]])
 
-        return result
-    
-    def regular_2(self):
-        node_map = self.copy_map()
-        reverse_map = {
-            v: k
-            for k, v in node_map.items()
-        }
-
-        for node in node_map.values():
-            if len(node.parents) == 1 and len(next(iter(node.parents)).children) == 1:
-                parent = next(iter(node.parents))
-                chilren = node.children
-                for child in chilren:
-                    child.add_parent(parent)
-                
-                orig = reverse_map[node]
-                node_map[orig] = parent
-                node.remove(keep_self=True)
-            
-            elif len(node.children) == 1 and len(next(iter(node.children)).parents) == 1:
-                child = next(iter(node.children))
-                parents = node.parents
-                for parent in parents:
-                    parent.add_child(child)
-                
-                orig = reverse_map[node]
-                node_map[orig] = child
-                node.remove(keep_self=True)
-
-        return Graph(node_map[self.root])
+        graph = Graph(copies[representatives[0]])
+        if provenance:
+            return graph, {node: copies[representatives[i]] for i, node in enumerate(nodes)}
+
+        return graph
     
-    def unique_indexes(self):
-        global node_index
+    def unique_indexes(self, start=None):
+        """
+        Give every node a new uuid from the process-wide counter,
+        or with `start`, graph-local uuids counting from `start` in `get_nodes` order,
+        which are the same whatever thread or process renumbers the graph.
+        """
+        nodes = self.get_nodes()
+        indexes = itertools.count(start) if start is not None else iter(next_node_index, None)
+        for node, index in zip(nodes, indexes):
+            node.uuid = str(index)
 
-        for node in self.get_nodes():
-            node.uuid = str(node_index)
-            node_index += 1
+        # node hashes depend on uuids, so the sets holding the renumbered nodes must be rebuilt
+        for node in nodes:
+            node.children = {n for n in node.children}
+            node.parents = {n for n in node.parents}
 
     def copy_map(self, keep_connections=True, node_type=None):
-        node_map = {node: (node_type if node_type else type(node))() for node in self.get_nodes()}
-        for node, copy in node_map.items():
-            for key, value in node.__dict__.items():
-                if key in Node.__annotations__:
-                    continue
-
-                copy.__dict__[key] = value
-
-            if keep_connections:
+        node_map = {node: copy_node(node, node_type) for node in self.get_nodes()}
+        if keep_connections:
+            for node, copy in node_map.items():
                 for child in node.children:
                     twin = node_map[child]
                     copy.add_child(twin)
@@ -234,6 +225,51 @@ class Graph:
         return None
 
 
+def copy_node(node: Node, node_type=None) -> Node:
+    """
+    Copy of `node` with a new uuid and no connections, keeping its other attributes.
+    """
+    copy = (node_type if node_type else type(node))()
+    for key, value in node.__dict__.items():
+        if key in Node.__annotations__:
+            continue
+
+        copy.__dict__[key] = value
+
+    return copy
+
+
+def _rebuild_graph(states: list, edges: list) -> Graph:
+    nodes = []
+    for node_type, state in states:
+        node = node_type.__new__(node_type)
+        node.__dict__.update(state)
+        node.children = set()
+        node.parents = set()
+        nodes.append(node)
+
+    for parent, child in edges:
+        nodes[parent].add_child(nodes[child])
+
+    return Graph(nodes[0])
+
+
+def _children(node: Node) -> set:
+    return node.children
+
+
+def _parents(node: Node) -> set:
+    return node.parents
+
+
+def _reversed_children(node: Node) -> Iterator:
+    return reversed(list(node.children))
+
+
+def _reversed_parents(node: Node) -> Iterator:
+    return reversed(list(node.parents))
+
+
 @dataclass
 class NodeMapping:
     left: set[Node]
@@ -0,0 +1,219 @@
+"""
+Versioned binary graph format.
+
+All integers are little-endian int64. The file is laid out as:
+    header (64 bytes)
+    uuids             [node_count]
+    operation_ids     [node_count]
+    child_offsets     [node_count + 1]
+    child_indexes     [edge_count]
+    parent_offsets    [node_count + 1]
+    parent_indexes    [edge_count]
+    pool_offsets      [pool_count + 1]
+    pool              utf-8 operation names, `pool_bytes` long
+    attributes        optional utf-8 JSON object, `attributes_bytes` long
+
+Array sections are loaded as zero-copy `memoryview`s over an `mmap` of the file.
+They can be wrapped with `numpy.asarray` without copying.
+"""
+from array import array
+import json
+import mmap
+import struct
+import sys
+from typing import IO, Optional, Union
+
+from . import Graph, Node
+from .compact import CompactGraph
+from .torch import ComputationNode
+from .serialization import iter_json_items, write_json
+
+
+MAGIC = b'SGPH'
+VERSION = 1
+HEADER = struct.Struct('<4sIIqqqqqq')
+HEADER_SIZE = 64
+NODE_TYPES = [Node, ComputationNode]
+
+
+def write_binary(graph: Union[Graph, CompactGraph], path: str, attributes: Optional[dict] = None) -> None:
+    with open(path, 'wb') as file:
+        for chunk in encode_binary(graph, attributes):
+            file.write(chunk)
+
+
+def encode_binary(graph: Union[Graph, CompactGraph], attributes: Optional[dict] = None) -> list:
+    """
+    The binary layout of `graph` as a list of byte buffers, which share memory with the graph's arrays where possible.
+    """
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_graph(graph)
+
+    pool = [operation.encode('utf-8') for operation in graph.operations]
+    pool_offsets = array('q', [0])
+    for operation in pool:
+        pool_offsets.append(pool_offsets[-1] + len(operation))
+    attributes_data = json.dumps(attributes).encode('utf-8') if attributes else b''
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        NODE_TYPES.index(graph.node_type) if graph.node_type in NODE_TYPES else 0,
+        len(graph),
+        graph.edge_count,
+        len(pool),
+        pool_offsets[-1],
+        len(attributes_data),
+        graph.root,
+    )
+
+    chunks = [header.ljust(HEADER_SIZE, b'\0')]
+    for section in (
+        graph.uuids,
+        graph.operation_ids,
+        graph.child_offsets,
+        graph.child_indexes,
+        graph.parent_offsets,
+        graph.parent_indexes,
+        pool_offsets,
+    ):
+        chunks.append(_int64_bytes(section))
+    chunks.extend(pool)
+    chunks.append(attributes_data)
+    return chunks
+
+
+def read_binary(path: str) -> CompactGraph:
+    """
+    Open a binary graph without parsing it: the adjacency arrays are views over the mapped file.
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return decode_binary(memoryview(buffer))
+
+
+def decode_binary(view: memoryview) -> CompactGraph:
+    """
+    `CompactGraph` whose arrays are views over `view`, which holds a binary graph.
+    """
+    _, node_type, node_count, edge_count, pool_count, pool_bytes, _, root = _read_header(view)
+
+    sections = []
+    position = HEADER_SIZE
+    for length in (node_count, node_count, node_count + 1, edge_count, node_count + 1, edge_count, pool_count + 1):
+        sections.append(_int64_view(view[position:position + 8 * length]))
+        position += 8 * length
+    uuids, operation_ids, child_offsets, child_indexes, parent_offsets, parent_indexes, pool_offsets = sections
+
+    pool = bytes(view[position:position + pool_bytes])
+    operations = [
+        pool[pool_offsets[i]:pool_offsets[i + 1]].decode('utf-8')
+        for i in range(pool_count)
+    ]
+
+    return CompactGraph(
+        root=root,
+        uuids=uuids,
+        child_offsets=child_offsets,
+        child_indexes=child_indexes,
+        parent_offsets=parent_offsets,
+        parent_indexes=parent_indexes,
+        operations=operations,
+        operation_ids=operation_ids,
+        node_type=NODE_TYPES[node_type],
+    )
+
+
+def read_binary_attributes(path: str) -> dict:
+    with open(path, 'rb') as file:
+        header = _read_header(file.read(HEADER_SIZE))
+        attributes_bytes = header[6]
+        if not attributes_bytes:
+            return {}
+
+        file.seek(-attributes_bytes, 2)
+        return json.loads(file.read(attributes_bytes).decode('utf-8'))
+
+
+def json_to_binary(json_file: IO[str], path: str, attributes: Optional[dict] = None) -> None:
+    """
+    Convert a `Graph.serialize` layout (array) or node editor layout (object) to the binary format.
+    """
+    write_binary(read_json_compact(json_file), path, attributes)
+
+
+def binary_to_json(path: str, json_file: IO[str]) -> None:
+    write_json(read_binary(path), json_file)
+
+
+def read_json_compact(file: IO[str]) -> CompactGraph:
+    """
+    Stream a JSON graph straight into a `CompactGraph`, without creating `Node` objects.
+    """
+    indexes = {}
+    uuids, operations, edges, parent_edges = [], [], [], []
+    child_ids = set()
+    order = []
+    root = None
+    node_type = Node
+
+    def intern(uuid):
+        index = indexes.get(uuid)
+        if index is None:
+            index = indexes[uuid] = len(uuids)
+            uuids.append(int(uuid))
+            operations.append(None)
+        return index
+
+    for key, data in iter_json_items(file):
+        index = intern(str(data.get('uuid', key)))
+        order.append(index)
+        if root is None and 'uuid' in data:
+            root = index
+        if 'operation' in data:
+            node_type = ComputationNode
+            operations[index] = data['operation']
+        for child_id in data['children']:
+            child = intern(str(child_id))
+            child_ids.add(child)
+            edges.append((index, child))
+        for parent_id in data.get('parents', ()):
+            parent_edges.append((index, intern(str(parent_id))))
+
+    if root is None:
+        root = next(index for index in order if index not in child_ids)
+
+    return CompactGraph.from_edges(uuids, edges, root, operations, node_type, parent_edges if parent_edges else None)
+
+
+def _read_header(data) -> tuple:
+    magic, version, *fields = HEADER.unpack(bytes(data[:HEADER.size]))
+    if magic != MAGIC:
+        raise ValueError('not a binary graph file')
+    if version != VERSION:
+        raise ValueError(f'unsupported binary graph version {version} (expected {VERSION})')
+
+    return (version, *fields)
+
+
+def _int64_bytes(values):
+    if isinstance(values, memoryview) and values.format == 'q' and sys.byteorder == 'little':
+        return values.cast('B')
+
+    if not isinstance(values, array) or values.typecode != 'q':
+        values = array('q', values)
+    if sys.byteorder != 'little':
+        values = array('q', values)
+        values.byteswap()
+
+    return memoryview(values).cast('B')
+
+
+def _int64_view(view: memoryview):
+    if sys.byteorder != 'little':
+        values = array('q', view.tobytes())
+        values.byteswap()
+        return values
+
+    return view.cast('q')
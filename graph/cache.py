@@ -0,0 +1,84 @@
+"""
+Content-addressed on-disk cache of graphs.
+
+Entries are binary graph files named after the hash of their key, so a hit is an `mmap` away.
+The least recently used entries are evicted once the cache grows past `max_bytes`.
+"""
+from hashlib import blake2b
+import json
+import os
+from typing import Optional, Union
+
+from . import Graph
+from .binary import VERSION, read_binary, write_binary
+from .compact import CompactGraph
+
+
+EXTENSION = '.sgph'
+
+
+class GraphCache:
+    def __init__(self, directory: str, max_bytes: int = 8 * 1024 ** 3) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(**parts) -> str:
+        """
+        Hash of `parts`, which must be JSON serializable. The binary format version is always part of the key.
+        """
+        data = json.dumps({'format': VERSION, **parts}, sort_keys=True)
+        return blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def get(self, key: str) -> Optional[CompactGraph]:
+        path = self.path(key)
+        try:
+            graph = read_binary(path)
+            # the modification time orders entries for eviction
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return graph
+
+    def put(self, key: str, graph: Union[Graph, CompactGraph], attributes: Optional[dict] = None) -> None:
+        """
+        Store `graph` under `key`. The file is written aside and renamed, so concurrent readers never see partial entries.
+        """
+        path = self.path(key)
+        partial = f'{path}.{os.getpid()}.partial'
+        write_binary(graph, partial, attributes)
+        os.replace(partial, path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(EXTENSION):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        # the most recent entry is kept even when it alone exceeds the budget
+        for _, size, name in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+            if name.endswith(EXTENSION)
+        )
@@ -0,0 +1,163 @@
+"""
+Multilevel coarsening of graphs.
+
+Every coarsening step merges groups of nodes of a graph into single nodes of a smaller graph,
+and records the projection from the nodes of the finer graph to the nodes of the coarser one.
+Steps only merge groups whose quotient stays acyclic.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from . import Graph, Node, copy_node
+from .subgraphs import SubgraphIndex
+
+
+@dataclass
+class Level:
+    graph: Graph
+    projection: dict
+    step: Optional[str] = None
+
+
+@dataclass
+class Hierarchy:
+    """
+    Levels from the original graph (level 0) to the coarsest one.
+    `levels[i].projection` maps the nodes of level `i - 1` to the nodes of level `i`.
+    """
+    levels: list = field(default_factory=list)
+
+    @property
+    def coarsest(self) -> Graph:
+        return self.levels[-1].graph
+
+    def project(self, node: Node, level: int) -> Node:
+        """
+        Node of `level` that a node of level 0 was merged into.
+        """
+        for i in range(1, level + 1):
+            node = self.levels[i].projection[node]
+
+        return node
+
+    def partition(self, level: int = -1) -> dict:
+        """
+        Nodes of level 0 merged into every node of `level`, in graph order.
+        """
+        level = level % len(self.levels)
+        members = {}
+        for node in self.levels[0].graph.get_nodes():
+            members.setdefault(self.project(node, level), []).append(node)
+
+        return members
+
+
+COARSENING_STEPS = {}
+
+
+def register_step(name: str):
+    """
+    Register a function `(graph, labelled) -> (coarse graph, projection)` as a coarsening step.
+    """
+    def register(step: Callable) -> Callable:
+        COARSENING_STEPS[name] = step
+        return step
+
+    return register
+
+
+def coarsen(graph: Graph, steps=('siblings', 'chains'), labelled: bool = False, max_levels: int = 16, min_ratio: float = 0.95) -> Hierarchy:
+    """
+    Apply `steps` in turn until a whole round shrinks the graph by less than `min_ratio`, or `max_levels` is reached.
+    Steps that do not merge anything do not add a level.
+    """
+    hierarchy = Hierarchy([Level(graph, {node: node for node in graph.get_nodes()})])
+    size = len(hierarchy.levels[0].projection)
+    while len(hierarchy.levels) < max_levels:
+        round_size = size
+        for name in steps:
+            coarse, projection = COARSENING_STEPS[name](hierarchy.coarsest, labelled)
+            coarse_size = len(set(projection.values()))
+            if coarse_size < size:
+                hierarchy.levels.append(Level(coarse, projection, name))
+                size = coarse_size
+            if len(hierarchy.levels) >= max_levels:
+                break
+
+        if size > min_ratio * round_size:
+            break
+
+    return hierarchy
+
+
+def quotient(graph: Graph, groups: dict, operations: Optional[dict] = None) -> tuple:
+    """
+    Merge the nodes of `graph` that share a group key in `groups` (missing nodes stay alone).
+    Each merged node is a copy of the first member in graph order, with the operation given for its key in `operations`.
+    Returns the coarse graph and the projection of every node to its merged node.
+    """
+    merged = {}
+    projection = {}
+    for node in graph.get_nodes():
+        key = groups.get(node, node)
+        if key not in merged:
+            merged[key] = copy_node(node)
+            if operations and key in operations and hasattr(merged[key], 'operation'):
+                merged[key].operation = operations[key]
+        projection[node] = merged[key]
+
+    for node, coarse in projection.items():
+        for child in node.children:
+            if projection[child] is not coarse:
+                coarse.add_child(projection[child])
+
+    return Graph(projection[graph.root]), projection
+
+
+@register_step('chains')
+def merge_chains(graph: Graph, labelled: bool = False) -> tuple:
+    """
+    `Graph.regular_2`: single-parent/single-child chains become one node. Labels are not compared.
+    """
+    return graph.regular_2(provenance=True)
+
+
+@register_step('siblings')
+def merge_siblings(graph: Graph, labelled: bool = False) -> tuple:
+    """
+    Merge nodes with the same parents and the same children, like the splits of one node.
+    """
+    # ids hash much faster than nodes, and are stable while the nodes are alive
+    groups = {
+        node: (frozenset(map(id, node.parents)), frozenset(map(id, node.children)), getattr(node, 'operation', None) if labelled else None)
+        for node in graph.get_nodes()
+    }
+    return quotient(graph, groups)
+
+
+@register_step('blocks')
+def fold_blocks(graph: Graph, labelled: bool = True, depth: int = 4) -> tuple:
+    """
+    Fold every occurrence of a repeated subgraph (see `SubgraphIndex`) into one node labelled with its fingerprint.
+    Occurrences that overlap an already folded one are left alone,
+    and so are the ones that end up on a cycle once folded, or below one.
+    """
+    index = SubgraphIndex(graph, depth=depth, labelled=labelled)
+    groups, operations = {}, {}
+    for fingerprint in index.repeated():
+        for root in index.groups[fingerprint]:
+            members = index.subgraph(root)
+            if any(member in groups for member in members):
+                continue
+
+            for member in members:
+                groups[member] = root
+            operations[root] = f'block:{fingerprint[:8]}'
+
+    while True:
+        coarse, projection = quotient(graph, groups, operations)
+        cyclic = set(coarse.get_nodes()).difference(coarse.topological_order())
+        if not cyclic:
+            return coarse, projection
+
+        groups = {node: key for node, key in groups.items() if projection[node] not in cyclic}
@@ -0,0 +1,352 @@
+from array import array
+from dataclasses import dataclass
+import json
+from typing import Iterator, Optional, Sequence
+
+from . import Graph, Node, hashing, next_node_index, traversal
+from .contraction import contract_chains
+
+
+class CompactNode:
+    """
+    Lightweight view of a node stored in a `CompactGraph`.
+    Views are created on demand and do not own any topology.
+    """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph: 'CompactGraph', index: int) -> None:
+        self.graph = graph
+        self.index = index
+
+    @property
+    def uuid(self) -> str:
+        return self.graph.uuid(self.index)
+
+    @property
+    def operation(self) -> Optional[str]:
+        return self.graph.operation(self.index)
+
+    @property
+    def children(self) -> list:
+        return [CompactNode(self.graph, i) for i in self.graph.children(self.index)]
+
+    @property
+    def parents(self) -> list:
+        return [CompactNode(self.graph, i) for i in self.graph.parents(self.index)]
+
+    def __hash__(self) -> int:
+        return hash((id(self.graph), self.index))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompactNode) and self.graph is other.graph and self.index == other.index
+
+    def __repr__(self) -> str:
+        return self.uuid
+
+    def serialize(self) -> str:
+        return json.dumps(self.graph.node_data(self.index))
+
+
+@dataclass(eq=False)
+class CompactGraph:
+    """
+    Graph backend that stores the topology as integer adjacency arrays.
+    Children are stored in CSR form and parents in CSC form, both indexed by interned node indexes.
+    Operation names are interned in a string pool and referenced by `operation_ids` (-1 for no operation).
+    """
+    root: int
+    uuids: Sequence[int]
+    child_offsets: Sequence[int]
+    child_indexes: Sequence[int]
+    parent_offsets: Sequence[int]
+    parent_indexes: Sequence[int]
+    operations: list
+    operation_ids: Sequence[int]
+    node_type: type = Node
+
+    def __len__(self) -> int:
+        return len(self.uuids)
+
+    def __eq__(self, other: 'CompactGraph') -> bool:
+        if not isinstance(other, CompactGraph):
+            return False
+
+        return hashing.are_isomorphic(self, other)
+
+    def structural_hash(self, labelled=False) -> str:
+        return hashing.structural_hash(self, labelled)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.child_indexes)
+
+    def children(self, index: int) -> Sequence[int]:
+        return self.child_indexes[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def parents(self, index: int) -> Sequence[int]:
+        return self.parent_indexes[self.parent_offsets[index]:self.parent_offsets[index + 1]]
+
+    def uuid(self, index: int) -> str:
+        return str(self.uuids[index])
+
+    def operation(self, index: int) -> Optional[str]:
+        operation_id = self.operation_ids[index]
+        if operation_id < 0:
+            return None
+
+        return self.operations[operation_id]
+
+    def node(self, index: int) -> CompactNode:
+        return CompactNode(self, index)
+
+    def node_data(self, index: int) -> dict:
+        data = {
+            'uuid': self.uuid(index),
+            'children': [self.uuid(i) for i in self.children(index)],
+            'parents': [self.uuid(i) for i in self.parents(index)],
+        }
+        if hasattr(self.node_type, 'operation'):
+            data['operation'] = self.operation(index)
+
+        return data
+
+    def serialize(self) -> str:
+        return '[' + ', '.join(node.serialize() for node in self.iter_nodes()) + ']'
+
+    def iter_indexes(self) -> Iterator:
+        """
+        Node indexes in the same order as `Graph.get_nodes`.
+        """
+        return traversal.bfs(
+            self.root,
+            lambda index: reversed(self.children(index)),
+            lambda index: reversed(self.parents(index)),
+        )
+
+    def get_indexes(self) -> list:
+        return list(self.iter_indexes())
+
+    def iter_nodes(self) -> Iterator:
+        return (self.node(index) for index in self.iter_indexes())
+
+    def get_nodes(self) -> list:
+        return list(self.iter_nodes())
+
+    def topological_order(self) -> Iterator:
+        return traversal.topological_order(self.get_indexes(), self.children, self.parents)
+
+    def reverse_topological_order(self) -> Iterator:
+        return traversal.reverse_topological_order(self.get_indexes(), self.children, self.parents)
+
+    def copy(self, keep_connections=True, node_type=None) -> 'CompactGraph':
+        count = len(self)
+        if keep_connections:
+            child_offsets, child_indexes = array('q', self.child_offsets), array('q', self.child_indexes)
+            parent_offsets, parent_indexes = array('q', self.parent_offsets), array('q', self.parent_indexes)
+        else:
+            child_offsets, child_indexes = array('q', bytes(8 * (count + 1))), array('q')
+            parent_offsets, parent_indexes = array('q', bytes(8 * (count + 1))), array('q')
+
+        return CompactGraph(
+            root=self.root,
+            uuids=array('q', self.uuids),
+            child_offsets=child_offsets,
+            child_indexes=child_indexes,
+            parent_offsets=parent_offsets,
+            parent_indexes=parent_indexes,
+            operations=list(self.operations),
+            operation_ids=array('q', self.operation_ids),
+            node_type=node_type if node_type else self.node_type,
+        )
+
+    def copy_map(self, keep_connections=True, node_type=None) -> dict:
+        copy = self.copy(keep_connections, node_type)
+        return {
+            self.node(index): copy.node(index)
+            for index in self.get_indexes()
+        }
+
+    def regular_2(self, provenance=False):
+        """
+        Contract single-parent/single-child chains like `Graph.regular_2`, keeping the surviving nodes' uuids.
+        With `provenance`, also return a map from every original index to the index that represents it.
+        """
+        order = self.get_indexes()
+        representatives, heads, tails = contract_chains(order, self.children, self.parents)
+        kept = list(tails)
+        remap = {index: i for i, index in enumerate(kept)}
+        uuids, operation_ids = array('q'), array('q')
+        child_offsets, child_indexes = array('q', [0]), array('q')
+        parent_offsets, parent_indexes = array('q', [0]), array('q')
+        for index in kept:
+            uuids.append(self.uuids[index])
+            operation_ids.append(self.operation_ids[index])
+            child_indexes.extend(remap[representatives[i]] for i in self.children(tails[index]))
+            child_offsets.append(len(child_indexes))
+            parent_indexes.extend(remap[representatives[i]] for i in self.parents(heads[index]))
+            parent_offsets.append(len(parent_indexes))
+
+        graph = CompactGraph(
+            root=remap[representatives[self.root]],
+            uuids=uuids,
+            child_offsets=child_offsets,
+            child_indexes=child_indexes,
+            parent_offsets=parent_offsets,
+            parent_indexes=parent_indexes,
+            operations=list(self.operations),
+            operation_ids=operation_ids,
+            node_type=self.node_type,
+        )
+        if provenance:
+            return graph, {index: remap[representatives[index]] for index in order}
+
+        return graph
+
+    def reverse_connections(self) -> 'CompactGraph':
+        roots = [index for index in self.get_indexes() if not len(self.children(index))]
+        if len(roots) == 1:
+            return CompactGraph(
+                root=roots[0],
+                uuids=self.uuids,
+                child_offsets=self.parent_offsets,
+                child_indexes=self.parent_indexes,
+                parent_offsets=self.child_offsets,
+                parent_indexes=self.child_indexes,
+                operations=self.operations,
+                operation_ids=self.operation_ids,
+                node_type=self.node_type,
+            ).copy()
+
+        root = len(self)
+        edges = [(index, parent) for index in range(len(self)) for parent in self.parents(index)]
+        edges.extend((root, r) for r in roots)
+        return CompactGraph.from_edges(
+            uuids=list(self.uuids) + [next_node_index()],
+            edges=edges,
+            root=root,
+            operations=[self.operation(index) for index in range(len(self))] + [None],
+            node_type=self.node_type,
+        )
+
+    def to_graph(self) -> Graph:
+        nodes = []
+        for index in range(len(self)):
+            node = self.node_type()
+            node.uuid = self.uuid(index)
+            if hasattr(node, 'operation'):
+                node.operation = self.operation(index)
+            nodes.append(node)
+
+        for index, node in enumerate(nodes):
+            for child in self.children(index):
+                node.add_child(nodes[child])
+
+        return Graph(nodes[self.root])
+
+    @staticmethod
+    def from_graph(graph: Graph) -> 'CompactGraph':
+        nodes = graph.get_nodes()
+        indexes = {node: i for i, node in enumerate(nodes)}
+        pool = {}
+
+        uuids, operation_ids = array('q'), array('q')
+        child_offsets, child_indexes = array('q', [0]), array('q')
+        parent_offsets, parent_indexes = array('q', [0]), array('q')
+        for node in nodes:
+            uuids.append(int(node.uuid))
+            operation = getattr(node, 'operation', None)
+            operation_ids.append(-1 if operation is None else pool.setdefault(operation, len(pool)))
+            child_indexes.extend(indexes[n] for n in node.children)
+            child_offsets.append(len(child_indexes))
+            parent_indexes.extend(indexes[n] for n in node.parents)
+            parent_offsets.append(len(parent_indexes))
+
+        return CompactGraph(
+            root=indexes[graph.root],
+            uuids=uuids,
+            child_offsets=child_offsets,
+            child_indexes=child_indexes,
+            parent_offsets=parent_offsets,
+            parent_indexes=parent_indexes,
+            operations=list(pool),
+            operation_ids=operation_ids,
+            node_type=next((type(node) for node in nodes if type(node) is not Node), Node),
+        )
+
+    @staticmethod
+    def from_edges(uuids: Sequence[int], edges: Sequence[tuple], root: int, operations: Optional[Sequence] = None, node_type: type = Node, parent_edges: Optional[Sequence[tuple]] = None) -> 'CompactGraph':
+        """
+        Build a graph from `(parent, child)` index pairs.
+        The relative order of the edges is kept in both adjacency arrays.
+        `parent_edges` optionally gives the same edges as `(child, parent)` pairs in the desired parent order.
+        """
+        count = len(uuids)
+        sources, targets = array('q', (edge[0] for edge in edges)), array('q', (edge[1] for edge in edges))
+        child_offsets, child_indexes = _compressed(count, sources, targets)
+        if parent_edges is None:
+            parent_offsets, parent_indexes = _compressed(count, targets, sources)
+        else:
+            parent_offsets, parent_indexes = _compressed(
+                count,
+                array('q', (edge[0] for edge in parent_edges)),
+                array('q', (edge[1] for edge in parent_edges)),
+            )
+
+        pool = {}
+        operation_ids = array('q', (
+            -1 if operation is None else pool.setdefault(operation, len(pool))
+            for operation in (operations if operations is not None else [None] * count)
+        ))
+
+        return CompactGraph(
+            root=root,
+            uuids=array('q', uuids),
+            child_offsets=child_offsets,
+            child_indexes=child_indexes,
+            parent_offsets=parent_offsets,
+            parent_indexes=parent_indexes,
+            operations=list(pool),
+            operation_ids=operation_ids,
+            node_type=node_type,
+        )
+
+    @staticmethod
+    def from_edge_arrays(uuids: Sequence[int], sources: Sequence[int], targets: Sequence[int], root: int, operations: list, operation_ids: Sequence[int], node_type: type = Node) -> 'CompactGraph':
+        """
+        Build a graph from parallel arrays of edge endpoints and already interned operations.
+        """
+        count = len(uuids)
+        child_offsets, child_indexes = _compressed(count, sources, targets)
+        parent_offsets, parent_indexes = _compressed(count, targets, sources)
+
+        return CompactGraph(
+            root=root,
+            uuids=array('q', uuids),
+            child_offsets=child_offsets,
+            child_indexes=child_indexes,
+            parent_offsets=parent_offsets,
+            parent_indexes=parent_indexes,
+            operations=list(operations),
+            operation_ids=array('q', operation_ids),
+            node_type=node_type,
+        )
+
+
+def _compressed(count: int, keys: Sequence[int], values: Sequence[int]) -> tuple:
+    """
+    Stable counting sort of `values` by `keys`, returning the offsets and the sorted values.
+    """
+    offsets = array('q', bytes(8 * (count + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+
+    cursor = array('q', offsets[:-1])
+    indexes = array('q', bytes(8 * len(values)))
+    for key, value in zip(keys, values):
+        position = cursor[key]
+        indexes[position] = value
+        cursor[key] = position + 1
+
+    return offsets, indexes
@@ -0,0 +1,42 @@
+from typing import Callable, Sequence
+
+
+def contract_chains(order: Sequence[int], children: Callable, parents: Callable) -> tuple:
+    """
+    Find the maximal single-parent/single-child chains of a graph in one sweep over the node indexes of `order`.
+    Returns `(representatives, heads, tails)`: the representative of every index,
+    and the first and last index of the chain of every representative.
+
+    Representatives are the nodes that survive when the chains are collapsed one node at a time in `order`,
+    like `Graph.regular_2` originally did: a node with a single parent that has a single child is merged into its parent,
+    otherwise a node with a single child that has a single parent is merged into its child.
+    """
+    size = max(order, default=-1) + 1
+    leader = list(range(size))
+    heads = list(range(size))
+    tails = list(range(size))
+
+    def find(index):
+        while leader[index] != index:
+            leader[index] = leader[leader[index]]
+            index = leader[index]
+        return index
+
+    for index in order:
+        group = find(index)
+        group_parents = parents(heads[group])
+        group_children = children(tails[group])
+        if len(group_parents) == 1 and len(children(group_parents[0])) == 1:
+            target = find(group_parents[0])
+            tails[target] = tails[group]
+            leader[group] = target
+        elif len(group_children) == 1 and len(parents(group_children[0])) == 1:
+            target = find(group_children[0])
+            heads[target] = heads[group]
+            leader[group] = target
+
+    representatives = {index: find(index) for index in order}
+    heads = {index: heads[index] for index in order if representatives[index] == index}
+    tails = {index: tails[index] for index in order if representatives[index] == index}
+    return representatives, heads, tails
+
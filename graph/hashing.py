@@ -0,0 +1,211 @@
+from hashlib import blake2b
+from typing import Optional
+
+from . import traversal
+
+
+DIGEST_SIZE = 16
+
+
+def structural_hash(graph, labelled: bool = False) -> str:
+    """
+    Canonical hash of the structure of `graph`, stable across processes so it can be stored and compared later.
+    Isomorphic graphs always hash the same. With `labelled`, node operations are part of the hash.
+    """
+    return _graph_digest(*_colors(graph, labelled))
+
+
+def are_isomorphic(graph1, graph2, labelled: bool = False) -> bool:
+    """
+    Whether there is a bijection between the nodes of both graphs that maps root to root and preserves every edge.
+    Mismatches are rejected by comparing node colors in near-linear time.
+    The exact search only runs on graphs with identical colors, and only tries nodes of the same color.
+    """
+    indexed1, colors1 = _colors(graph1, labelled)
+    indexed2, colors2 = _colors(graph2, labelled)
+    if _graph_digest(indexed1, colors1) != _graph_digest(indexed2, colors2):
+        return False
+
+    return _match(indexed1, colors1, indexed2, colors2)
+
+
+def deduplicate(graphs: list, labelled: bool = False, hashes: Optional[dict] = None) -> list:
+    """
+    Group `graphs` into lists of isomorphic graphs, in order of first appearance.
+    `hashes` optionally caches `structural_hash` results by `id(graph)` across calls.
+    It keeps each graph next to its hash, since a freed graph's id can be reused by another graph.
+    """
+    hashes = {} if hashes is None else hashes
+    buckets = {}
+    groups = []
+    for graph in graphs:
+        cached, key = hashes.get(id(graph), (None, None))
+        if cached is not graph:
+            key = structural_hash(graph, labelled)
+            hashes[id(graph)] = graph, key
+
+        for group in buckets.setdefault(key, []):
+            if are_isomorphic(group[0], graph, labelled):
+                group.append(graph)
+                break
+        else:
+            group = [graph]
+            buckets[key].append(group)
+            groups.append(group)
+
+    return groups
+
+
+def subgraph_hashes(graph, labelled: bool = True, depth: Optional[int] = None) -> list:
+    """
+    Hash of the subgraph below every node, in `get_nodes` order (`get_indexes` for a `CompactGraph`).
+    With `depth`, only the nodes at most `depth` edges below count, so that repeated blocks hash the same
+    even though everything below them differs. Equal hashes mean equal structure once the subgraphs are unrolled into trees.
+    """
+    return _below(_Indexed(graph, labelled), depth)
+
+
+class _Indexed:
+    """
+    Index-based adjacency of a `Graph` or `CompactGraph`. Index 0 is the root.
+    """
+    def __init__(self, graph, labelled: bool) -> None:
+        if hasattr(graph, 'get_indexes'):
+            order = graph.get_indexes()
+            indexes = {index: i for i, index in enumerate(order)}
+            self.children = [[indexes[c] for c in graph.children(index)] for index in order]
+            self.parents = [[indexes[p] for p in graph.parents(index)] for index in order]
+            operations = [graph.operation(index) for index in order]
+        else:
+            nodes = graph.get_nodes()
+            indexes = {node: i for i, node in enumerate(nodes)}
+            self.children = [[indexes[c] for c in node.children] for node in nodes]
+            self.parents = [[indexes[p] for p in node.parents] for node in nodes]
+            operations = [getattr(node, 'operation', None) for node in nodes]
+
+        self.labels = [
+            (operation or '').encode('utf-8') if labelled else b''
+            for operation in operations
+        ]
+
+    def __len__(self) -> int:
+        return len(self.children)
+
+
+def _colors(graph, labelled: bool) -> tuple:
+    """
+    Color every node with the hash of everything below it and everything above it.
+    This is Weisfeiler-Lehman-style refinement specialised to acyclic graphs:
+    one bottom-up and one top-down pass reach the colors that iterating over children and parents would.
+    """
+    indexed = _Indexed(graph, labelled)
+    count = len(indexed)
+    below, above = _below(indexed), [b''] * count
+
+    for i in traversal.topological_order(range(count), indexed.children.__getitem__, indexed.parents.__getitem__):
+        above[i] = _digest(indexed.labels[i], [above[p] for p in indexed.parents[i]])
+
+    return indexed, [_digest(below[i], [above[i]]) for i in range(count)]
+
+
+def _below(indexed: _Indexed, depth: Optional[int] = None) -> list:
+    count = len(indexed)
+    if depth is None:
+        below = [b''] * count
+        for i in traversal.reverse_topological_order(range(count), indexed.children.__getitem__, indexed.parents.__getitem__):
+            below[i] = _digest(indexed.labels[i], [below[c] for c in indexed.children[i]])
+        return below
+
+    below = [_digest(label, []) for label in indexed.labels]
+    for _ in range(depth):
+        below = [_digest(indexed.labels[i], [below[c] for c in indexed.children[i]]) for i in range(count)]
+
+    return below
+
+
+def _digest(label: bytes, digests: list) -> bytes:
+    digest = blake2b(label, digest_size=DIGEST_SIZE)
+    digest.update(b'\0')
+    for d in sorted(digests):
+        digest.update(d)
+
+    return digest.digest()
+
+
+def _graph_digest(indexed: _Indexed, colors: list) -> str:
+    if not colors:
+        return blake2b(digest_size=DIGEST_SIZE).hexdigest()
+
+    return blake2b(colors[0] + b''.join(sorted(colors)), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def _match(indexed1: _Indexed, colors1: list, indexed2: _Indexed, colors2: list) -> bool:
+    """
+    Backtracking search for a root-preserving isomorphism, with an explicit stack instead of recursion.
+    Nodes are matched in breadth-first order, so every node but the root has an already-matched neighbor
+    that narrows its candidates down to that neighbor's image's neighbors of the same color.
+    """
+    count = len(indexed1)
+    if count != len(indexed2):
+        return False
+
+    order, anchors = _anchored_order(indexed1)
+    mapping = [-1] * count
+    used = bytearray(count)
+
+    def candidates(u: int):
+        anchor = anchors[u]
+        if anchor is None:
+            pool = [0]
+        elif u in indexed1.children[anchor]:
+            pool = indexed2.children[mapping[anchor]]
+        else:
+            pool = indexed2.parents[mapping[anchor]]
+
+        return (v for v in pool if colors2[v] == colors1[u] and not used[v])
+
+    def consistent(u: int, v: int) -> bool:
+        return _mapped_within(indexed1.children[u], mapping, indexed2.children[v]) and \
+            _mapped_within(indexed1.parents[u], mapping, indexed2.parents[v])
+
+    iterators = [candidates(order[0])]
+    while iterators:
+        u = order[len(iterators) - 1]
+        if mapping[u] >= 0:
+            used[mapping[u]] = 0
+            mapping[u] = -1
+
+        for v in iterators[-1]:
+            if consistent(u, v):
+                mapping[u] = v
+                used[v] = 1
+                break
+        else:
+            iterators.pop()
+            continue
+
+        if len(iterators) == count:
+            return True
+        iterators.append(candidates(order[len(iterators)]))
+
+    return False
+
+
+def _anchored_order(indexed: _Indexed) -> tuple:
+    anchors = [None] * len(indexed)
+    visited = bytearray(len(indexed))
+    visited[0] = 1
+    order = []
+    for u in traversal.bfs(0, indexed.children.__getitem__, indexed.parents.__getitem__):
+        order.append(u)
+        for n in indexed.children[u] + indexed.parents[u]:
+            if not visited[n]:
+                visited[n] = 1
+                anchors[n] = u
+
+    return order, anchors
+
+
+def _mapped_within(neighbors: list, mapping: list, targets: list) -> bool:
+    targets = set(targets)
+    return all(mapping[n] < 0 or mapping[n] in targets for n in neighbors)
@@ -0,0 +1,124 @@
+"""
+Graph passes that transform one working graph in place.
+
+Passes are registered with the properties of the graph they read and write.
+A `PassManager` copies its input once, runs its passes in order on that copy,
+and skips a pass when nothing it reads has changed since it last ran.
+"""
+from dataclasses import dataclass
+import time
+from typing import Callable
+
+from . import Graph, Node
+from .contraction import contract_chains
+
+
+TOPOLOGY = 'topology'
+UUIDS = 'uuids'
+
+
+@dataclass
+class Pass:
+    name: str
+    function: Callable[[Graph], None]
+    reads: frozenset
+    writes: frozenset
+    idempotent: bool = True
+
+
+PASSES = {}
+
+
+def register_pass(name: str, reads=(TOPOLOGY,), writes=(TOPOLOGY,), idempotent: bool = True):
+    """
+    Register a function that transforms a `Graph` in place. It may replace `graph.root`.
+    Only `idempotent` passes are skipped when their inputs have not changed.
+    """
+    def register(function: Callable[[Graph], None]) -> Callable[[Graph], None]:
+        PASSES[name] = Pass(name, function, frozenset(reads), frozenset(writes), idempotent)
+        return function
+
+    return register
+
+
+class PassManager:
+    def __init__(self, passes: list, counters: bool = True) -> None:
+        self.passes = [PASSES[name] for name in passes]
+        self.counters = counters
+        self.stats = []
+
+    def run(self, graph: Graph, copy: bool = True) -> Graph:
+        """
+        Run the passes on `graph`, or on a single copy of it with `copy`.
+        `stats` holds the time and resulting node and edge counts of every pass.
+        """
+        if copy:
+            graph = Graph(graph.copy_map()[graph.root])
+
+        versions = {}
+        seen = {}
+        self.stats = []
+        for graph_pass in self.passes:
+            inputs = {resource: versions.get(resource, 0) for resource in graph_pass.reads}
+            stat = {'pass': graph_pass.name, 'skipped': graph_pass.idempotent and seen.get(graph_pass.name) == inputs}
+
+            start = time.perf_counter()
+            if not stat['skipped']:
+                graph_pass.function(graph)
+                for resource in graph_pass.writes:
+                    versions[resource] = versions.get(resource, 0) + 1
+                seen[graph_pass.name] = {resource: versions.get(resource, 0) for resource in graph_pass.reads}
+            stat['time'] = time.perf_counter() - start
+
+            if self.counters:
+                nodes = graph.get_nodes()
+                stat['nodes'] = len(nodes)
+                stat['edges'] = sum(len(node.children) for node in nodes)
+            self.stats.append(stat)
+
+        return graph
+
+
+@register_pass('regular_2')
+def regular_2(graph: Graph) -> None:
+    """
+    `Graph.regular_2` without copying: the representative of every chain takes over the connections of the chain.
+    """
+    nodes = graph.get_nodes()
+    indexes = {node: i for i, node in enumerate(nodes)}
+    children = [[indexes[n] for n in node.children] for node in nodes]
+    parents = [[indexes[n] for n in node.parents] for node in nodes]
+    representatives, _, tails = contract_chains(range(len(nodes)), children.__getitem__, parents.__getitem__)
+
+    for node in nodes:
+        node.children = set()
+        node.parents = set()
+    for i, tail in tails.items():
+        for child in children[tail]:
+            nodes[i].add_child(nodes[representatives[child]])
+
+    graph.root = nodes[representatives[0]]
+
+
+@register_pass('reverse_connections', idempotent=False)
+def reverse_connections(graph: Graph) -> None:
+    """
+    `Graph.reverse_connections` without copying. Several new roots get a new common root.
+    """
+    nodes = graph.get_nodes()
+    for node in nodes:
+        node.children, node.parents = node.parents, node.children
+
+    roots = [node for node in nodes if not node.parents]
+    if len(roots) == 1:
+        graph.root = roots[0]
+        return
+
+    graph.root = Node()
+    for root in roots:
+        graph.root.add_child(root)
+
+
+@register_pass('unique_indexes', reads=(UUIDS,), writes=(UUIDS,))
+def unique_indexes(graph: Graph) -> None:
+    graph.unique_indexes()
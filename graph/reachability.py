@@ -0,0 +1,171 @@
+"""
+Reachability and dominator index over a `Graph`.
+
+Roots are numbered in `get_nodes` order, and every node keeps the set of roots that reach it as an integer bitset.
+Dominators are relative to all the roots (a node dominates another if every path from a root to it passes through it),
+and post-dominators relative to the leaf (every path from the other to the leaf passes through it).
+Both trees are built in one topological sweep each, intersecting the trees of the neighbors like Cooper, Harvey and Kennedy.
+"""
+from typing import Iterator, Optional
+
+from . import Graph, Node, traversal
+
+
+class ReachabilityIndex:
+    def __init__(self, graph: Graph) -> None:
+        self.graph = graph
+        nodes = list(graph.topological_order())
+        # splits of one node share its position and are told apart by the second element
+        self.positions = {node: (i, 0) for i, node in enumerate(nodes)}
+        self.roots = [node for node in graph.get_nodes() if not node.parents]
+        self.reach = {}
+        self.dominators = {}
+        self.post_dominators = {}
+        self._counts = {}
+
+        bits = {root: 1 << i for i, root in enumerate(self.roots)}
+        for node in nodes:
+            reach = bits.get(node, 0)
+            for parent in node.parents:
+                reach |= self.reach[parent]
+            self.reach[node] = reach
+            self.dominators[node] = self._intersect(node.parents, self.dominators, 1)
+
+        for node in reversed(nodes):
+            self.post_dominators[node] = self._intersect(node.children, self.post_dominators, -1)
+
+    def roots_reaching(self, node: Node) -> list:
+        reach = self.reach[node]
+        return [root for i, root in enumerate(self.roots) if reach >> i & 1]
+
+    def root_count(self, node: Node) -> int:
+        return bin(self.reach[node]).count('1')
+
+    def reaches(self, root: Node, node: Node) -> bool:
+        return bool(self.reach[node] >> self.roots.index(root) & 1)
+
+    def dominates(self, dominator: Node, node: Node) -> bool:
+        return dominator in self._chain(node, self.dominators)
+
+    def post_dominates(self, post_dominator: Node, node: Node) -> bool:
+        return post_dominator in self._chain(node, self.post_dominators)
+
+    def ancestor_count(self, node: Node) -> int:
+        """
+        Number of strict ancestors of `node`. Exact counts need a walk, which is cached until the next update.
+        """
+        key = ('ancestors', node)
+        if key not in self._counts:
+            self._counts[key] = sum(1 for _ in traversal.bfs(node, _parents)) - 1
+
+        return self._counts[key]
+
+    def descendant_count(self, node: Node) -> int:
+        key = ('descendants', node)
+        if key not in self._counts:
+            self._counts[key] = sum(1 for _ in traversal.bfs(node, _children)) - 1
+
+        return self._counts[key]
+
+    def split(self, node: Node, splits: list) -> None:
+        """
+        Update the index after `split_node(node)` (without interconnectivity) replaced `node` by `splits`,
+        which share its parents and children.
+        """
+        position = self.positions.pop(node)
+        reach = self.reach.pop(node)
+        dominator = self.dominators.pop(node)
+        post_dominator = self.post_dominators.pop(node)
+        self._counts = {}
+
+        for i, split in enumerate(splits):
+            self.positions[split] = (position[0], position[1] + i)
+            self.reach[split] = reach
+            self.dominators[split] = dominator
+            self.post_dominators[split] = post_dominator
+
+        # nodes that only `node` dominated are now dominated by the first node above all the splits
+        replacement = splits[0] if len(splits) == 1 else None
+        for tree, parent in ((self.dominators, dominator), (self.post_dominators, post_dominator)):
+            for n, d in tree.items():
+                if d is node:
+                    tree[n] = replacement if replacement is not None else parent
+
+        if node in self.roots:
+            i = self.roots.index(node)
+            self.roots[i:i + 1] = splits
+            low = (1 << i) - 1
+            for n, reach in self.reach.items():
+                if reach >> i & 1:
+                    self.reach[n] = (reach & low) | (((1 << len(splits)) - 1) << i) | (reach >> (i + 1) << (i + len(splits)))
+                else:
+                    self.reach[n] = (reach & low) | (reach >> (i + 1) << (i + len(splits)))
+            for j, split in enumerate(splits):
+                self.reach[split] = 1 << (i + j)
+
+    def contracted(self, graph: Graph, projection: dict) -> 'ReachabilityIndex':
+        """
+        Index of `graph`, the result of `Graph.regular_2(provenance=True)` on the indexed graph, derived from this one
+        without walking `graph`: `projection` maps every node of the indexed graph to the node of its chain.
+        """
+        heads, tails = {}, {}
+        for node, chain in projection.items():
+            if chain not in heads or self.positions[node] < self.positions[heads[chain]]:
+                heads[chain] = node
+            if chain not in tails or self.positions[node] > self.positions[tails[chain]]:
+                tails[chain] = node
+
+        index = ReachabilityIndex.__new__(ReachabilityIndex)
+        index.graph = graph
+        index.positions = {chain: self.positions[head] for chain, head in heads.items()}
+        index.roots = [projection[root] for root in self.roots]
+        index.reach = {chain: self.reach[head] for chain, head in heads.items()}
+        index.dominators = {chain: _project(self.dominators[head], projection) for chain, head in heads.items()}
+        index.post_dominators = {chain: _project(self.post_dominators[tail], projection) for chain, tail in tails.items()}
+        index._counts = {}
+        return index
+
+    def _intersect(self, nodes, tree: dict, direction: int) -> Optional[Node]:
+        """
+        Nearest common ancestor in `tree` of `nodes`, or None when only the virtual entry (or exit) is common.
+        Ancestors come first in topological order for dominators (`direction` 1), last for post-dominators (-1).
+        """
+        common = None
+        for i, node in enumerate(nodes):
+            if not i:
+                common = node
+                continue
+
+            a, b = common, node
+            while a is not None and b is not None and a is not b:
+                if direction * _compare(self.positions[a], self.positions[b]) > 0:
+                    a = tree[a]
+                else:
+                    b = tree[b]
+            if a is None or b is None:
+                return None
+            common = a
+
+        return common
+
+    def _chain(self, node: Node, tree: dict) -> Iterator:
+        node = tree[node]
+        while node is not None:
+            yield node
+            node = tree[node]
+
+
+def _compare(a: tuple, b: tuple) -> int:
+    return (a > b) - (a < b)
+
+
+def _project(node: Optional[Node], projection: dict) -> Optional[Node]:
+    return None if node is None else projection[node]
+
+
+def _parents(node: Node):
+    return node.parents
+
+
+def _children(node: Node):
+    return node.children
@@ -0,0 +1,167 @@
+import json
+from typing import IO, Iterator, Optional
+
+from . import Graph, Node
+from .torch import ComputationNode
+
+
+def write_json(graph: Graph, file: IO[str]) -> None:
+    """
+    Write `graph` to `file` in the `Graph.serialize` layout, one node at a time.
+    The output is identical to `Graph.serialize`, without building the whole string in memory.
+    """
+    file.write('[')
+    for i, node in enumerate(graph.iter_nodes()):
+        if i:
+            file.write(', ')
+        file.write(node.serialize())
+    file.write(']')
+
+
+def read_json(file: IO[str], node_type: Optional[type] = None) -> Optional[Graph]:
+    """
+    Build a graph from a file in the `Graph.serialize` layout, parsing one node at a time.
+    The first serialized node is the root. Nodes are `ComputationNode`s when the layout has operations.
+    """
+    nodes = {}
+    root = None
+    for _, data in iter_json_items(file):
+        if node_type is None:
+            node_type = ComputationNode if 'operation' in data else Node
+
+        node = _get_node(nodes, data['uuid'], node_type)
+        if 'operation' in data:
+            node.operation = data['operation']
+        for child_id in data['children']:
+            node.add_child(_get_node(nodes, str(child_id), node_type))
+
+        if root is None:
+            root = node
+
+    if root is None:
+        return None
+
+    return Graph(root)
+
+
+def read_rules_json(file: IO[str]) -> Optional[Graph]:
+    """
+    Build a graph from a file in the node editor layout (`{id: {'children': [...]}}`), parsing one node at a time.
+    Like `Graph.from_rules`, the root is the first node in file order that is nobody's child.
+    """
+    nodes = {}
+    order = []
+    child_ids = set()
+    for node_id, data in iter_json_items(file):
+        node = _get_node(nodes, str(node_id), Node)
+        order.append(node.uuid)
+        for child_id in data['children']:
+            node.add_child(_get_node(nodes, str(child_id), Node))
+            child_ids.add(str(child_id))
+
+    for node_id in order:
+        if node_id not in child_ids:
+            return Graph(nodes[node_id])
+
+    return None
+
+
+def iter_json_items(file: IO[str], chunk_size: int = 1 << 16) -> Iterator[tuple]:
+    """
+    Incrementally parse a top-level JSON array or object, yielding `(index, value)` or `(key, value)` pairs.
+    Only the current item and one read chunk are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    reader = _Reader(file, chunk_size)
+
+    opening = reader.next_char()
+    if opening not in '[{':
+        raise ValueError(f'expected a JSON array or object, got {opening!r}')
+    closing = ']' if opening == '[' else '}'
+
+    if reader.peek_char() == closing:
+        return
+
+    index = 0
+    while True:
+        if opening == '{':
+            key = reader.decode(decoder)
+            if reader.next_char() != ':':
+                raise ValueError(f'expected ":" after key {key!r}')
+        else:
+            key = index
+
+        yield key, reader.decode(decoder)
+        index += 1
+
+        delimiter = reader.next_char()
+        if delimiter == closing:
+            return
+        if delimiter != ',':
+            raise ValueError(f'expected "," or {closing!r}, got {delimiter!r}')
+
+
+_NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+class _Reader:
+    def __init__(self, file: IO[str], chunk_size: int) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+
+    def fill(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def skip_whitespace(self) -> None:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer) or not self.fill():
+                return
+
+    def peek_char(self) -> str:
+        self.skip_whitespace()
+        if self.position >= len(self.buffer):
+            raise ValueError('unexpected end of JSON input')
+
+        return self.buffer[self.position]
+
+    def next_char(self) -> str:
+        char = self.peek_char()
+        self.position += 1
+        return char
+
+    def decode(self, decoder: json.JSONDecoder):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+                # a value that ends the buffer may be a truncated number or literal,
+                # and so may a number followed by what could continue it ('1.' of '1.5', '1e' of '1e5')
+                if end < len(self.buffer) and not (type(value) in (int, float) and self.buffer[end] in _NUMBER_CHARS):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+
+            if not self.fill():
+                value, self.position = decoder.raw_decode(self.buffer, self.position)
+                return value
+
+
+def _get_node(nodes: dict, uuid: str, node_type: type) -> Node:
+    node = nodes.get(uuid)
+    if node is None:
+        node = node_type()
+        node.uuid = uuid
+        nodes[uuid] = node
+
+    return node
@@ -0,0 +1,73 @@
+"""
+Immutable graph snapshots in shared memory.
+
+A snapshot holds a graph in the binary format inside a `multiprocessing.shared_memory` block.
+Snapshots pickle to the name of their block, so passing one to a worker process copies no graph data:
+the worker attaches to the block and reads the adjacency arrays in place.
+"""
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Union
+
+from . import Graph
+from .binary import decode_binary, encode_binary
+from .compact import CompactGraph
+
+
+class GraphSnapshot:
+    def __init__(self, memory: SharedMemory, owner: bool) -> None:
+        self.memory = memory
+        self.owner = owner
+        self._graph = None
+
+    @staticmethod
+    def create(graph: Union[Graph, CompactGraph], attributes: Optional[dict] = None) -> 'GraphSnapshot':
+        """
+        Copy `graph` into a new shared memory block, which lives until the creating snapshot is `close`d.
+        """
+        chunks = [memoryview(chunk).cast('B') for chunk in encode_binary(graph, attributes)]
+        memory = SharedMemory(create=True, size=max(1, sum(chunk.nbytes for chunk in chunks)))
+        position = 0
+        for chunk in chunks:
+            memory.buf[position:position + chunk.nbytes] = chunk
+            position += chunk.nbytes
+
+        return GraphSnapshot(memory, owner=True)
+
+    @staticmethod
+    def attach(name: str) -> 'GraphSnapshot':
+        # attaching registers the block with the resource tracker again,
+        # which is harmless in child processes since they share the tracker of their parent
+        return GraphSnapshot(SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def graph(self) -> CompactGraph:
+        """
+        Read-only `CompactGraph` over the shared block.
+        """
+        if self._graph is None:
+            self._graph = decode_binary(self.memory.buf.toreadonly())
+
+        return self._graph
+
+    def __reduce__(self):
+        return GraphSnapshot.attach, (self.name,)
+
+    def __enter__(self) -> 'GraphSnapshot':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Detach from the block, and free it if this snapshot created it.
+        Every graph returned by `graph` must be released first, since its arrays point into the block.
+        """
+        self._graph = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,86 @@
+from typing import Optional
+
+from . import Graph, Node, copy_node, hashing, traversal
+
+
+class SubgraphIndex:
+    """
+    Groups the nodes of a graph by the fingerprint of the subgraph rooted at them: their operation and everything below.
+    Repeated blocks, like the encoder blocks of a traced transformer, only share their fingerprint up to some `depth`
+    since everything below the last block differs, so `depth` should be about the size of one block.
+    It has no default for that reason: `None` hashes whole subgraphs, and only finds blocks repeated down to the leaf.
+    """
+    def __init__(self, graph: Graph, depth: Optional[int], labelled: bool = True) -> None:
+        self.graph = graph
+        self.depth = depth
+        nodes = graph.get_nodes()
+        hashes = hashing.subgraph_hashes(graph, labelled, depth)
+
+        self.fingerprints = {node: fingerprint.hex() for node, fingerprint in zip(nodes, hashes)}
+        self.groups = {}
+        for node in nodes:
+            self.groups.setdefault(self.fingerprints[node], []).append(node)
+        self._sizes = {}
+
+    def subgraph(self, node: Node) -> list:
+        """
+        Nodes of the subgraph rooted at `node`, in breadth-first order.
+        """
+        return list(self._depths(node))
+
+    def size(self, fingerprint: str) -> int:
+        if fingerprint not in self._sizes:
+            self._sizes[fingerprint] = len(self.subgraph(self.groups[fingerprint][0]))
+
+        return self._sizes[fingerprint]
+
+    def repeated(self, min_count: int = 2, min_size: int = 2) -> list:
+        """
+        Fingerprints that occur at least `min_count` times, largest savings (`size * (count - 1)`) first.
+        A group is left out when each of its occurrences hangs below an occurrence of a group repeated as often,
+        so that only the outermost fingerprint of a repeated block is reported.
+        """
+        candidates = {
+            fingerprint
+            for fingerprint, nodes in self.groups.items()
+            if len(nodes) >= min_count and self.size(fingerprint) >= min_size
+        }
+
+        def covered(fingerprint: str) -> bool:
+            nodes = self.groups[fingerprint]
+            shared = None
+            for node in nodes:
+                parents = {self.fingerprints[p] for p in node.parents}
+                shared = parents if shared is None else shared & parents
+            return any(f in candidates and len(self.groups[f]) == len(nodes) for f in shared or ())
+
+        return sorted(
+            (fingerprint for fingerprint in candidates if not covered(fingerprint)),
+            key=lambda fingerprint: self.size(fingerprint) * (len(self.groups[fingerprint]) - 1),
+            reverse=True,
+        )
+
+    def template(self, fingerprint: str) -> Graph:
+        """
+        Copy of one occurrence of `fingerprint`, standing for all of them.
+        """
+        depths = self._depths(self.groups[fingerprint][0])
+        copies = {node: copy_node(node) for node in depths}
+        for node, copy in copies.items():
+            if self.depth is None or depths[node] < self.depth:
+                for child in node.children:
+                    copy.add_child(copies[child])
+
+        return Graph(copies[self.groups[fingerprint][0]])
+
+    def _depths(self, node: Node) -> dict:
+        """
+        Distance from `node` of every node of its subgraph, in breadth-first order.
+        """
+        depths = {node: 0}
+        expand = lambda n: n.children if self.depth is None or depths[n] < self.depth else ()
+        for n in traversal.bfs(node, expand):
+            for child in expand(n):
+                depths.setdefault(child, depths[n] + 1)
+
+        return depths
@@ -0,0 +1,81 @@
+from collections import deque
+from typing import Callable, Hashable, Iterable, Iterator
+
+
+Neighbors = Callable[[Hashable], Iterable]
+
+
+def bfs(start: Hashable, *neighbors: Neighbors) -> Iterator:
+    """
+    Breadth-first walk from `start` in O(V+E).
+    For every visited node, the nodes returned by each `neighbors` function are queued in order.
+    """
+    visited = {start}
+    queue = deque([start])
+
+    while queue:
+        node = queue.popleft()
+        yield node
+
+        for expand in neighbors:
+            for n in expand(node):
+                if n not in visited:
+                    visited.add(n)
+                    queue.append(n)
+
+
+def dfs(start: Hashable, *neighbors: Neighbors) -> Iterator:
+    """
+    Depth-first pre-order walk from `start` in O(V+E), using an explicit stack of iterators.
+    """
+    visited = {start}
+    stack = [_chain(start, neighbors)]
+    yield start
+
+    while stack:
+        for n in stack[-1]:
+            if n not in visited:
+                visited.add(n)
+                stack.append(_chain(n, neighbors))
+                yield n
+                break
+        else:
+            stack.pop()
+
+
+def topological_order(nodes: Iterable, children: Neighbors, parents: Neighbors) -> Iterator:
+    """
+    Kahn's algorithm over `nodes`, yielding parents before their children.
+    Ties are broken by the order of `nodes`, then by the order of `children`.
+    """
+    nodes = list(nodes)
+    pending = {node: _degree(parents(node)) for node in nodes}
+    queue = deque(node for node in nodes if not pending[node])
+
+    while queue:
+        node = queue.popleft()
+        yield node
+
+        for child in children(node):
+            pending[child] -= 1
+            if not pending[child]:
+                queue.append(child)
+
+
+def reverse_topological_order(nodes: Iterable, children: Neighbors, parents: Neighbors) -> Iterator:
+    """
+    Kahn's algorithm over `nodes`, yielding children before their parents.
+    """
+    return topological_order(nodes, parents, children)
+
+
+def _chain(node, neighbors: tuple) -> Iterator:
+    for expand in neighbors:
+        yield from expand(node)
+
+
+def _degree(neighbors: Iterable) -> int:
+    if hasattr(neighbors, '__len__'):
+        return len(neighbors)
+
+    return sum(1 for _ in neighbors)
@@ -1,31 +1,249 @@
-import torch
+"""
+Trace models into shared graphs.
 
-from ops.torch import computation_graph
-from models.spectral_ar_vit import ArSpectralDiffusionTransformer
+    python main.py models.simple.SimpleModel models.spectral_ar_vit.ArSpectralDiffusionTransformer@1x32x17x4:complex64
+    python main.py models.sdxl --passes regular_2 --format binary --memory-limit 48
+
+A spec is a dotted path to an `nn.Module` subclass, or to a module exposing a `model` callable (like `models.sdxl`),
+optionally followed by `@<shape>[:<dtype>]` for the input. Models in `INPUTS` have a default input.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import resource
+import time
+
+from graph import Graph
+from graph.cache import GraphCache
+from graph.passes import PASSES, PassManager
+from timing import timed
+
+
+INPUTS = {
+    'models.simple.SimpleModel': ((5, 4), 'float32'),
+    'models.spectral_ar_vit.ArSpectralDiffusionTransformer': ((1, 32, 17, 4), 'complex64'),
+    'models.sdxl': ((1, 4, 512 // 8, 512 // 8), 'float16'),
+}
+
+EXTENSIONS = {
+    'json': 'json',
+    'binary': 'sgph',
+}
+
+
+def parse_spec(spec: str) -> tuple:
+    """
+    Split a spec into `(path, shape, dtype)`.
+    """
+    path, _, input_spec = spec.partition('@')
+    if not input_spec:
+        if path not in INPUTS:
+            raise ValueError(f'{path!r} has no default input, give one as {path}@<shape>[:<dtype>]')
+        return (path, *INPUTS[path])
+
+    shape, _, dtype = input_spec.partition(':')
+    return path, tuple(int(size) for size in shape.split('x')), dtype or 'float32'
+
+
+def load_model(path: str, model_kwargs: dict):
+    """
+    Import `path` as a module exposing `model`, or as a class to instantiate with `model_kwargs`.
+    """
+    try:
+        return importlib.import_module(path).model
+    except ModuleNotFoundError as error:
+        if error.name != path:
+            raise
+        module, _, name = path.rpartition('.')
+        return getattr(importlib.import_module(module), name)(**model_kwargs)
+
+
+def source_hash(path: str) -> str:
+    """
+    Hash of every source file of the top-level package of the module or class at `path`, found without executing it,
+    so that changes to the modules the model imports from its own package count too.
+    """
+    spec = importlib.util.find_spec(path.split('.')[0])
+    if spec.submodule_search_locations is None:
+        files = [(os.path.basename(spec.origin), spec.origin)]
+    else:
+        files = sorted(
+            (os.path.relpath(os.path.join(directory, name), location), os.path.join(directory, name))
+            for location in spec.submodule_search_locations
+            for directory, _, names in os.walk(location)
+            for name in names
+            if name.endswith('.py')
+        )
+
+    digest = blake2b(digest_size=16)
+    for name, file in files:
+        digest.update(name.encode())
+        with open(file, 'rb') as source_file:
+            digest.update(blake2b(source_file.read(), digest_size=16).digest())
+
+    return digest.hexdigest()
+
+
+def cache_parts(path: str, shape: tuple, dtype: str, model_kwargs: dict, device: str) -> dict:
+    """
+    Everything a trace and its passes depend on. The model sources stand in for its parameter shapes,
+    so that a key can be computed without constructing the model.
+    """
+    return {
+        'model': path,
+        'source': source_hash(path),
+        'kwargs': model_kwargs,
+        'shape': list(shape),
+        'dtype': dtype,
+        'device': device,
+        # read from the package metadata, so that cache hits do not import torch
+        'torch': importlib.metadata.version('torch'),
+        'tracer': source_hash('ops'),
+        # the passes and the graph conversions, which cached post-pass graphs went through
+        'graph': source_hash('graph'),
+    }
+
+
+def trace(model, shape: tuple, dtype: str, device: str) -> Graph:
+    import torch
+    from ops.torch import computation_graph, meta_computation_graph
+
+    dtype = getattr(torch, dtype)
+    if device == 'meta':
+        input = torch.empty(shape, dtype=dtype, device=device, requires_grad=True)
+        if isinstance(model, torch.nn.Module):
+            return meta_computation_graph(model, input)
+    else:
+        input = torch.rand(shape, device=device).to(dtype).requires_grad_()
+
+    return computation_graph(model(input))
+
+
+def write(graph: Graph, path: str, output_format: str) -> None:
+    if output_format == 'binary':
+        from graph.binary import write_binary
+        write_binary(graph, path)
+        return
+
+    from graph.serialization import write_json
+    with open(path, 'w') as graph_file:
+        write_json(graph, graph_file)
+
+
+def run_task(task: dict) -> dict:
+    """
+    Trace one spec and run the pass chain, timing every stage. Failures are reported instead of raised,
+    so one model running out of memory does not abort the others.
+    """
+    stages = {}
+    result = {'spec': task['spec'], 'stages': stages, 'cache': '-'}
+    passes = task['passes']
+    cache = GraphCache(task['cache_dir'], task['cache_bytes']) if task['cache_dir'] else None
+    try:
+        path, shape, dtype = parse_spec(task['spec'])
+        graph, done = None, 0
+        if cache is not None:
+            with timed(stages, 'cache'):
+                parts = cache_parts(path, shape, dtype, task['model_kwargs'], task['device'])
+                for done in sorted({len(passes), 0}, reverse=True):
+                    graph = cache.get(GraphCache.key(**parts, passes=passes[:done]))
+                    if graph is not None:
+                        break
+            result['cache'] = 'miss' if graph is None else f'{done}/{len(passes)}'
+
+        if graph is None:
+            with timed(stages, 'load'):
+                model = load_model(path, task['model_kwargs'])
+            with timed(stages, 'trace'):
+                graph = trace(model, shape, dtype, task['device'])
+            del model
+            if cache is not None:
+                cache.put(GraphCache.key(**parts, passes=[]), graph, {'spec': task['spec']})
+        elif done < len(passes):
+            # cached uuids may collide with the ones this process hands out, so the nodes are renumbered
+            graph = graph.to_graph()
+            graph.unique_indexes()
+
+        # the traced graph is not shared, so the passes work on it directly
+        manager = PassManager(passes[done:], counters=False)
+        graph = manager.run(graph, copy=False)
+        for stat in manager.stats:
+            stages[stat['pass']] = stages.get(stat['pass'], 0) + stat['time']
+        if cache is not None and done < len(passes):
+            cache.put(GraphCache.key(**parts, passes=passes), graph, {'spec': task['spec'], 'passes': passes})
+
+        result['output'] = os.path.join(task['output_dir'], f'{path}.{EXTENSIONS[task["format"]]}')
+        with timed(stages, 'write'):
+            write(graph, result['output'], task['format'])
+        result['nodes'] = len(graph.get_nodes())
+    except Exception as error:
+        result['error'] = f'{type(error).__name__}: {error}'
+
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def limit_memory(limit_gb: float) -> None:
+    if limit_gb:
+        limit = int(limit_gb * 1024 ** 3)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
 
 
 def main():
-    """"
-    input_dim = 10
-    hidden_dim = 16
-    output_dim = 5
-    input = torch.randn(5, input_dim)
-    model = ThreeOperationModel(input_dim=input_dim, hidden_dim=hidden_dim, output_dim=output_dim)
-    input = torch.randn(5, 4)
-    model = SimpleModel()
-
-    input = torch.rand(1, 32, 17, 4, requires_grad=True).to(torch.complex64)
-    model = ArSpectralDiffusionTransformer(blocks=5)
-    """
-    input = torch.rand(1, 4, 512 // 8, 512 // 8, requires_grad=True, dtype=torch.float16, device='cuda')
-    from models.sdxl import model
-
-    graph = computation_graph(model(input))
-    graph = graph.regular_2()
-
-    json_data = graph.serialize()
-    with open('graph/render/graphData.json', 'w') as graph_file:
-        graph_file.write(json_data)
+    parser = argparse.ArgumentParser(description='Trace models into computation graphs and run graph passes on them.')
+    parser.add_argument('specs', nargs='+', help='model specs, like models.simple.SimpleModel or models.sdxl@1x4x64x64:float16')
+    parser.add_argument('--passes', nargs='*', default=['regular_2'], choices=sorted(PASSES), help='passes to run, in order')
+    parser.add_argument('--format', default='json', choices=sorted(EXTENSIONS))
+    parser.add_argument('--output-dir', default='graph/render')
+    parser.add_argument('--device', default='meta', help='device of the input, meta traces without allocating activations')
+    parser.add_argument('--model-kwargs', type=json.loads, default={}, help='JSON object passed to model classes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--memory-limit', type=float, default=0, help='address space limit per worker, in GB')
+    parser.add_argument('--cache-dir', default='.graph_cache', help='traced graph cache, empty to disable')
+    parser.add_argument('--cache-size', type=float, default=8, help='cache size limit, in GB')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tasks = [
+        {
+            'spec': spec,
+            'passes': args.passes,
+            'format': args.format,
+            'output_dir': args.output_dir,
+            'device': args.device,
+            'model_kwargs': args.model_kwargs,
+            'cache_dir': args.cache_dir,
+            'cache_bytes': int(args.cache_size * 1024 ** 3),
+        }
+        for spec in args.specs
+    ]
+
+    start = time.perf_counter()
+    # one model per worker process, so memory is returned to the system and the limit applies to each model
+    with ProcessPoolExecutor(
+        max_workers=min(args.workers, len(tasks)),
+        max_tasks_per_child=1,
+        initializer=limit_memory,
+        initargs=(args.memory_limit,),
+    ) as executor:
+        results = list(executor.map(run_task, tasks))
+
+    stage_names = list(dict.fromkeys(name for result in results for name in result['stages']))
+    print(f'{"spec":>60} {"nodes":>8} {"cache":>6} {"rss MB":>8} ' + ' '.join(f'{name:>12}' for name in stage_names))
+    for r in results:
+        times = ' '.join(f'{r["stages"][name]:12.4f}' if name in r['stages'] else f'{"-":>12}' for name in stage_names)
+        print(f'{r["spec"]:>60} {r.get("nodes", "-"):>8} {r["cache"]:>6} {r["peak_rss_kb"] / 1024:8.1f} {times}')
+        if 'error' in r:
+            print(f'{"":>60} {r["error"]}')
+    print(f'total {time.perf_counter() - start:.4f}s')
+
+    if any('error' in r for r in results):
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 import functools
 import gc
 import math
@@ -71,16 +72,75 @@ def sinusoidal_embedding_2d(h, w, d, device=None):
     return embeds
 
 
-def create_attention_mask(h, w, device=None):
+@dataclass(frozen=True, eq=False)
+class SpiralMask:
+    """
+    Causal "spiral layer" mask: a token attends to the tokens of its own spiral layer and of every layer inside it.
+    Tokens are in u id order, so layers never decrease along the sequence and the mask is block lower-triangular:
+    query `i` attends exactly to the keys before `key_limits[i]`.
+    `key_limits` are plain ints, so walking the mask tile by tile never reads tensor data, even on the meta device.
+    """
+    layers: torch.Tensor
+    key_limits: tuple
+
+    def __len__(self):
+        return len(self.layers)
+
+    def bool(self):
+        return self.layers[None, :] <= self.layers[:, None]
+
+    def dense(self, dtype=torch.float32):
+        return torch.zeros(len(self), len(self), device=self.layers.device, dtype=dtype).masked_fill(~self.bool(), -float("inf"))
+
+    def key_limit(self, q_start, q_end):
+        """
+        Number of keys attended to by any of the queries `q_start:q_end`.
+        """
+        return self.key_limits[q_end - 1]
+
+    def block(self, q_start, q_end, k_start, k_end):
+        """
+        Boolean mask of a tile, or None when the queries attend to every key of the tile.
+        """
+        if self.key_limits[q_start] >= k_end:
+            return None
+
+        return self.layers[k_start:k_end][None, :] <= self.layers[q_start:q_end][:, None]
+
+
+def create_attention_mask(h, w, device=None, dtype=torch.float32, form="dense"):
+    """
+    Spiral layer mask for a `h` x `w` spectrum in u id order, cached per `(h, w, device, dtype, form)`.
+    `form` is "dense" for an additive mask of 0 and -inf, "bool" for True where attention is allowed,
+    or "sparse" for a `SpiralMask` that attention can walk tile by tile.
+    The result is shared between calls and must not be modified in place.
+    """
+    return _attention_mask(h, w, torch.device(device if device is not None else "cpu"), dtype, form)
+
+
+@functools.lru_cache(maxsize=16)
+def _attention_mask(h, w, device, dtype, form):
+    mask = spiral_mask(h, w, device)
+    if form == "sparse":
+        return mask
+    if form == "bool":
+        return mask.bool()
+    if form == "dense":
+        return mask.dense(dtype)
+
+    raise ValueError(f"unknown mask form {form!r}")
+
+
+@functools.lru_cache(maxsize=16)
+def spiral_mask(h, w, device=None):
+    # layers only depend on the shape, so they are computed on the cpu, which also works for a meta `device`
     s = max(h, w)
-    mask = torch.full((s**2, s**2), -float("inf"), device=device, dtype=torch.float32)
-    for t in range(s):
-        start_index = u_ids_count(t)
-        end_index = u_ids_count(t+1)
-        mask[start_index:end_index, 0:end_index] = 0
-    reorder = create_u_ids(s, s).reshape(s, s)[:h, :w].flatten().msort()
-    reordered = mask[reorder][:, reorder]
-    return reordered
+    u_ids = create_u_ids(s, s).reshape(s, s)[:h, :w].flatten().msort().long()
+    # layer t holds the u ids from u_ids_count(t - 1) up to u_ids_count(t)
+    bounds = u_ids_count(torch.arange(s + 1))
+    layers = torch.bucketize(u_ids, bounds, right=True)
+    key_limits = tuple(torch.searchsorted(layers, layers, right=True).tolist())
+    return SpiralMask(layers.to(device), key_limits)
 
 
 @functools.lru_cache
@@ -147,12 +207,15 @@ def create_noise_matrix(b, h, w, d, seed=None, device=None, dtype=None):
 
 
 class ArSpectralDiffusionTransformer(torch.nn.Module):
-    def __init__(self, hidden_dim: int = 512, heads: int = 8, blocks: int = 12, dropout: float = 0.5):
+    def __init__(self, hidden_dim: int = 512, heads: int = 8, blocks: int = 12, dropout: float = 0.5, **attention_kwargs):
+        """
+        :param attention_kwargs: `tiled`, `block_size` and `save_attention` of `SpectralMultiheadAttention`
+        """
         super().__init__()
         self.tokens_in = torch.nn.Linear(4, hidden_dim, dtype=torch.complex64)
         self.positional_embeddings = PositionalEmbedding(hidden_dim, dropout)
         self.encoder_blocks = torch.nn.Sequential(*[
-            SpectralTransformerEncoderBlock(hidden_dim, heads, dropout)
+            SpectralTransformerEncoderBlock(hidden_dim, heads, dropout, **attention_kwargs)
             for _ in range(blocks)
         ])
         self.tokens_out = torch.nn.Linear(hidden_dim, 4, dtype=torch.complex64)
@@ -160,7 +223,7 @@ class ArSpectralDiffusionTransformer(torch.nn.Module):
     def forward(self, x, mask=None, padding=None):
         """
         :param x: Tensor(B, H, W, C)
-        :param mask: Tensor(HxW, HxW)
+        :param mask: Tensor(HxW, HxW), bool Tensor(HxW, HxW) or `SpiralMask`
         :param padding: Tensor(B, HxW)
         :return:
         """
@@ -179,6 +242,95 @@ class ArSpectralDiffusionTransformer(torch.nn.Module):
 
         return self.tokens_out(x)
 
+    def start_generation(self, h, w, device=None):
+        """
+        Empty generation state for a `h` x `w` spectrum, to be filled one spiral layer at a time with `step`.
+        """
+        return GenerationState(
+            h=h,
+            w=w,
+            u_ids=create_u_ids(h, w, device=device),
+            mask=spiral_mask(h, w, torch.device(device if device is not None else "cpu")),
+            caches=[KVCache() for _ in self.encoder_blocks],
+        )
+
+    def step(self, tokens, state):
+        """
+        Run the next tokens of the sequence through the model, attending to the keys and values cached by earlier steps.
+        Tokens must complete spiral layers, since tokens attend to their whole layer.
+        A step spanning several layers masks the later layers of the step from the earlier ones.
+        The outputs match `forward` with the spiral layer mask, in sequence order.
+        :param tokens: Tensor(B, N, C) for the sequence positions `state.length` to `state.length + N`
+        :return: Tensor(B, N, 4)
+        """
+        start, end = state.length, state.length + tokens.shape[1]
+        if end > len(state.mask):
+            raise ValueError(f"tokens {start}:{end} go past the {len(state.mask)} tokens of the spectrum")
+        if state.mask.key_limits[end - 1] != end:
+            raise ValueError(f"tokens {start}:{end} end in the middle of a spiral layer")
+
+        rows, cols = state.positions(start, end)
+        x = self.positional_embeddings(self.tokens_in(tokens), (rows, cols))
+        # None when the step is a single layer, which attends to all the keys
+        mask = state.mask.block(start, end, 0, end)
+        for block, cache in zip(self.encoder_blocks, state.caches):
+            x = block(x, mask, cache=cache)
+
+        state.length = end
+        return self.tokens_out(x)
+
+    def generate(self, tokens_for_layer, h, w, device=None):
+        """
+        Build a spectrum one spiral layer at a time, with one `step` per layer.
+        :param tokens_for_layer: called with the grid `(rows, cols)` of the tokens of the next layer
+            and the outputs of the previous layer (None for the first one), returns Tensor(B, N, C) for those tokens
+        :return: Tensor(B, H, W, 4)
+        """
+        state = self.start_generation(h, w, device)
+        outputs = []
+        for start, end in state.layer_bounds():
+            outputs.append(self.step(tokens_for_layer(state.positions(start, end), outputs[-1] if outputs else None), state))
+
+        x = torch.cat(outputs, dim=1)
+        return x[:, torch.argsort(state.u_ids)].reshape(x.shape[0], h, w, x.shape[-1])
+
+
+@dataclass
+class KVCache:
+    """
+    Keys and values of the tokens seen so far by one attention layer, as Tensor(B*heads, S, head_dim).
+    """
+    keys: Optional[torch.Tensor] = None
+    values: Optional[torch.Tensor] = None
+
+    def append(self, keys, values):
+        if self.keys is not None:
+            keys = torch.cat([self.keys, keys], dim=1)
+            values = torch.cat([self.values, values], dim=1)
+        self.keys, self.values = keys, values
+        return keys, values
+
+
+@dataclass
+class GenerationState:
+    h: int
+    w: int
+    u_ids: torch.Tensor
+    mask: SpiralMask
+    caches: list
+    length: int = 0
+
+    def positions(self, start, end):
+        """
+        Grid rows and columns of the sequence positions `start:end`, in the order `forward` puts tokens in.
+        """
+        grid = self.u_ids[start:end].long()
+        return grid // self.w, grid % self.w
+
+    def layer_bounds(self):
+        limits = sorted(set(self.mask.key_limits))
+        return list(zip([0] + limits[:-1], limits))
+
 
 class PositionalEmbedding(torch.nn.Module):
     def __init__(self, hidden_dim, dropout):
@@ -187,20 +339,24 @@ class PositionalEmbedding(torch.nn.Module):
         positional_embeddings = sinusoidal_embedding_2d(32, 17, hidden_dim)
         self.register_buffer('positional_embeddings', positional_embeddings)
 
-    def forward(self, x):
+    def forward(self, x, positions=None):
         """
-        :param x: Tensor(B, H, W, D) with HxW the size of the image
+        :param x: Tensor(B, H, W, D) with HxW the size of the image, or Tensor(B, N, D) for the tokens at `positions`
+        :param positions: grid `(rows, cols)` of the N tokens
         :return:
         """
-        x = x + self.positional_embeddings[:x.shape[1], :x.shape[2]]
+        if positions is None:
+            x = x + self.positional_embeddings[:x.shape[1], :x.shape[2]]
+        else:
+            x = x + self.positional_embeddings[positions]
         x = self.dropout(x)
         return x
 
 
 class SpectralTransformerEncoderBlock(torch.nn.Module):
-    def __init__(self, hidden_dim: int, heads: int, dropout: float, ff_hidden_dim: Optional[int] = None):
+    def __init__(self, hidden_dim: int, heads: int, dropout: float, ff_hidden_dim: Optional[int] = None, **attention_kwargs):
         super().__init__()
-        self.self_attn = SpectralMultiheadAttention(hidden_dim, heads, dropout)
+        self.self_attn = SpectralMultiheadAttention(hidden_dim, heads, dropout, **attention_kwargs)
         self.norm1 = SpectralLayerNorm(hidden_dim)
         self.dropout_sa = SpectralDropout(dropout)
 
@@ -211,8 +367,8 @@ class SpectralTransformerEncoderBlock(torch.nn.Module):
         self.dropout_ff2 = SpectralDropout(dropout)
         self.norm2 = SpectralLayerNorm(hidden_dim)
 
-    def forward(self, x, mask=None, padding=None):
-        x = x + self.dropout_sa(self.self_attn(x, mask, padding))
+    def forward(self, x, mask=None, padding=None, cache=None):
+        x = x + self.dropout_sa(self.self_attn(x, mask, padding, cache))
         x = self.norm1(x)
 
         x = x + self.dropout_ff2(self.ff2(self.dropout_ff1(self.activation(self.ff1(x)))))
@@ -220,33 +376,74 @@ class SpectralTransformerEncoderBlock(torch.nn.Module):
 
 
 class SpectralLayerNorm(torch.nn.Module):
-    def __init__(self, hidden_dim, eps: float = 1e-5):
+    def __init__(self, hidden_dim, eps: float = 1e-5, recompute: bool = False):
+        """
+        :param recompute: only keep the input for backward and recompute the whitening then, to save activation memory
+        """
         super().__init__()
         self.gamma = torch.nn.Parameter(torch.tensor([[1 / math.sqrt(2), 0, 1 / math.sqrt(2)]], dtype=torch.float32).repeat(hidden_dim, 1).clone())
         self.beta = torch.nn.Parameter(torch.zeros(hidden_dim, dtype=torch.complex64))
         self.eps = eps
+        self.recompute = recompute
 
     def forward(self, x):
-        b, s, d = x.shape
+        """
+        Whiten the real and imaginary parts of every token with the inverse square root of their 2x2 covariance,
+        then mix them with the symmetric 2x2 matrix `[[g0, g1], [g1, g2]]` of every feature.
+        """
         x = x - x.mean(dim=-1, keepdim=True)
-        var = torch.bmm(
-            torch.view_as_real(x).transpose(-2, -1).reshape(b * s, 2, d),
-            torch.view_as_real(x).reshape(b * s, d, 2)
-        ) / (d - 1)
+        if self.recompute and torch.is_grad_enabled():
+            real, imag = SpectralWhitening.apply(x.real, x.imag, self.eps)
+        else:
+            real, imag = whiten_2x2(x.real, x.imag, self.eps)
+
+        g0, g1, g2 = self.gamma.unbind(dim=-1)
+        return torch.complex(g0 * real + g1 * imag, g1 * real + g2 * imag) + self.beta
 
-        inter = [self.eps] * 2
-        eigen_vals, eigen_vecs = torch.linalg.eigh(var + torch.diag(torch.tensor(inter, device=x.device)))
-        eigen_vals = 1 / torch.sqrt(eigen_vals)
-        std_inv = torch.bmm(torch.bmm(eigen_vecs, torch.diag_embed(eigen_vals)), torch.linalg.inv(eigen_vecs))
 
-        x = torch.bmm(std_inv, torch.view_as_real(x).transpose(-2, -1).flatten(end_dim=1))
-        gamma = torch.stack([self.gamma[:, :2], self.gamma[:, 1:]], dim=-1).repeat(b * s, 1, 1)
-        x = torch.view_as_complex((gamma @ x.permute(2, 0, 1).reshape(d * b * s, 2, 1)).reshape(d, b * s, 2).permute(1, 0, 2).contiguous()) + self.beta
-        return x.view(b, s, d)
+def whiten_2x2(real, imag, eps):
+    """
+    Multiply every token by the inverse square root of its covariance `M = [[a, c], [c, e]] + eps * I`, in closed form:
+    with `s = sqrt(det M)` and `t = sqrt(tr M + 2s)`, `M^(-1/2) = [[e + s, -c], [-c, a + s]] / (s * t)`.
+    """
+    d = real.shape[-1]
+    a = (real * real).sum(dim=-1, keepdim=True) / (d - 1) + eps
+    c = (real * imag).sum(dim=-1, keepdim=True) / (d - 1)
+    e = (imag * imag).sum(dim=-1, keepdim=True) / (d - 1) + eps
+
+    s = torch.sqrt(a * e - c * c)
+    norm = 1 / (s * torch.sqrt(a + e + 2 * s))
+    return ((e + s) * real - c * imag) * norm, ((a + s) * imag - c * real) * norm
+
+
+class SpectralWhitening(torch.autograd.Function):
+    """
+    `whiten_2x2` that saves only its inputs for backward, and recomputes the rest there.
+    """
+    @staticmethod
+    def forward(ctx, real, imag, eps):
+        ctx.save_for_backward(real, imag)
+        ctx.eps = eps
+        return whiten_2x2(real, imag, eps)
+
+    @staticmethod
+    def backward(ctx, grad_real, grad_imag):
+        real, imag = ctx.saved_tensors
+        with torch.enable_grad():
+            real, imag = real.detach().requires_grad_(), imag.detach().requires_grad_()
+            outputs = whiten_2x2(real, imag, ctx.eps)
+            grads = torch.autograd.grad(outputs, (real, imag), (grad_real, grad_imag))
+
+        return grads[0], grads[1], None
 
 
 class SpectralMultiheadAttention(torch.nn.Module):
-    def __init__(self, hidden_dim: int, heads: int, dropout: float):
+    def __init__(self, hidden_dim: int, heads: int, dropout: float, tiled: bool = False, block_size: int = 128, save_attention: bool = False):
+        """
+        :param tiled: compute attention tile by tile with an online softmax, without materializing the (s, s) weights.
+            Tiles that a `SpiralMask` rules out entirely are skipped.
+        :param save_attention: keep the last weights for `get_last_attention_weights`, which needs the dense path
+        """
         super().__init__()
         self.head_dim = hidden_dim // heads
         assert self.head_dim * heads == hidden_dim, "hidden_dim must be divisible by the number of heads"
@@ -260,25 +457,92 @@ class SpectralMultiheadAttention(torch.nn.Module):
         self.scale = math.sqrt(self.head_dim)
         self.hidden_dim = hidden_dim
         self.heads = heads
+        self.tiled = tiled
+        self.block_size = block_size
+        self.save_attention = save_attention
 
-        self.saved_attn = None  # test
+        self.saved_attn = None
 
-    def forward(self, x, mask=None, padding=None):
+    def forward(self, x, mask=None, padding=None, cache=None):
+        """
+        :param mask: additive Tensor(S, S), bool Tensor(S, S) with True where attention is allowed, or `SpiralMask`
+        :param cache: `KVCache` of the earlier tokens, which `x` attends to entirely, and which is extended with `x`
+        """
         b, s, d = x.shape
         query = self.to_q(x).view(b, s, self.heads, self.head_dim).permute(0, 2, 1, 3).reshape(b * self.heads, s, self.head_dim)
         key = self.to_k(x).view(b, s, self.heads, self.head_dim).permute(0, 2, 1, 3).reshape(b * self.heads, s, self.head_dim)
         value = self.to_v(x).view(b, s, self.heads, self.head_dim).permute(0, 2, 1, 3).reshape(b * self.heads, s, self.head_dim)
+        if cache is not None:
+            key, value = cache.append(key, value)
+
+        # padding masks pairs of tokens, which the tiles do not support
+        if self.tiled and padding is None and not self.save_attention:
+            res = self.tiled_attention(query, key, value, mask)
+        else:
+            res = self.dense_attention(query, key, value, mask, padding)
+
+        res = res.view(b, self.heads, s, self.head_dim).permute(0, 2, 1, 3).reshape(b, s, self.heads * self.head_dim)
+        res = self.dropout(res)
+        return self.to_out(res)
+
+    def dense_attention(self, query, key, value, mask=None, padding=None):
         attn = torch.bmm(query, key.conj().transpose(-1, -2)) / self.scale
-        if mask is not None:
+        if isinstance(mask, SpiralMask):
+            mask = mask.bool()
+        if mask is not None and mask.dtype == torch.bool:
+            attn = attn.masked_fill(~mask, -float("inf"))
+        elif mask is not None:
             attn = attn + mask
         if padding is not None:
             attn = attn + padding[:, None] + padding[None, :]
         attn = (attn - attn.real.max(dim=-1, keepdim=True)[0]).exp()
         attn = (attn / attn.sum(dim=-1, keepdim=True))
-        self.saved_attn = attn
-        res = torch.bmm(attn, value).view(b, self.heads, s, self.head_dim).permute(0, 2, 1, 3).reshape(b, s, self.heads * self.head_dim)
-        res = self.dropout(res)
-        return self.to_out(res)
+        self.saved_attn = attn if self.save_attention else None
+        return torch.bmm(attn, value)
+
+    def tiled_attention(self, query, key, value, mask=None):
+        """
+        Same result as `dense_attention`. The softmax weights `exp(a - max(a.real))` are normalized by their complex sum,
+        so the running maximum can be updated tile by tile as in FlashAttention: earlier tiles are rescaled by a real factor.
+        """
+        bh, s, _ = query.shape
+        bs = self.block_size
+        rows = []
+        for q_start in range(0, s, bs):
+            q_end = min(q_start + bs, s)
+            q = query[:, q_start:q_end]
+            k_limit = mask.key_limit(q_start, q_end) if isinstance(mask, SpiralMask) else key.shape[1]
+
+            maximum = torch.full((bh, q_end - q_start, 1), -float("inf"), device=query.device, dtype=q.real.dtype)
+            total = torch.zeros((bh, q_end - q_start, 1), device=query.device, dtype=query.dtype)
+            acc = torch.zeros_like(q)
+            for k_start in range(0, k_limit, bs):
+                k_end = min(k_start + bs, k_limit)
+                attn = torch.bmm(q, key[:, k_start:k_end].conj().transpose(-1, -2)) / self.scale
+                if isinstance(mask, SpiralMask):
+                    tile = mask.block(q_start, q_end, k_start, k_end)
+                elif mask is not None and mask.dtype == torch.bool:
+                    tile = mask[q_start:q_end, k_start:k_end]
+                else:
+                    tile = None
+                    if mask is not None:
+                        attn = attn + mask[q_start:q_end, k_start:k_end]
+                if tile is not None:
+                    attn = attn.masked_fill(~tile, -float("inf"))
+
+                new_maximum = torch.maximum(maximum, attn.real.amax(dim=-1, keepdim=True))
+                # rows without any allowed key so far have no maximum yet
+                shift = torch.where(torch.isfinite(new_maximum), new_maximum, torch.zeros_like(new_maximum))
+                rescale = torch.exp(maximum - shift)
+                weights = torch.exp(attn - shift)
+                total = total * rescale + weights.sum(dim=-1, keepdim=True)
+                acc = acc * rescale + torch.bmm(weights, value[:, k_start:k_end])
+                maximum = new_maximum
+
+            rows.append(acc / total)
+
+        self.saved_attn = None
+        return torch.cat(rows, dim=1)
 
     def get_last_attention_weights(self):
         return self.saved_attn
@@ -290,24 +554,33 @@ class SpectralDropout(torch.nn.Module):
         self.p = p
 
     def forward(self, x):
-        return spectral_dropout(x, self.p)
+        return spectral_dropout(x, self.p, self.training)
 
 
-def spectral_dropout(x, p):
-    magnitude = torch.nn.functional.dropout(x.abs(), p)
-    phase = torch.nn.functional.dropout(x.angle(), p)
-    real_part = magnitude * torch.cos(phase)
-    imag_part = magnitude * torch.sin(phase)
-    return torch.complex(real_part, imag_part)
+def spectral_dropout(x, p, training=True):
+    """
+    Drop the magnitude and the phase of every element independently, like `torch.nn.functional.dropout` on each
+    (kept phases are scaled by `1 / (1 - p)` too), with both masks drawn at once and the result built by one `polar`.
+    Returns `x` itself when there is nothing to drop.
+    """
+    if not training or p == 0:
+        return x
+    if p == 1:
+        return torch.zeros_like(x)
+
+    masks = torch.empty((2,) + x.shape, device=x.device, dtype=x.real.dtype).bernoulli_(1 - p).div_(1 - p)
+    return torch.polar(x.abs() * masks[0], x.angle() * masks[1])
 
 
 class SpectralSoftplus(torch.nn.Module):
     def __init__(self, beta, threshold):
         super().__init__()
-        self.softplus = torch.nn.Softplus(beta=beta, threshold=threshold)
+        self.beta = beta
+        self.threshold = threshold
 
     def forward(self, x):
-        return self.softplus(x.real) + 1j * self.softplus(x.imag)
+        # the real and imaginary parts side by side, activated in one call
+        return torch.view_as_complex(torch.nn.functional.softplus(torch.view_as_real(x), self.beta, self.threshold))
 
 
 def warmup_scheduler(optimizer, warmup_steps, min_lr, max_lr):
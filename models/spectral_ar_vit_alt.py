@@ -289,24 +289,33 @@ class SpectralDropout(torch.nn.Module):
         self.p = p
 
     def forward(self, x):
-        return spectral_dropout(x, self.p)
+        return spectral_dropout(x, self.p, self.training)
 
 
-def spectral_dropout(x, p):
-    magnitude = torch.nn.functional.dropout(x.abs(), p)
-    phase = torch.nn.functional.dropout(x.angle(), p)
-    real_part = magnitude * torch.cos(phase)
-    imag_part = magnitude * torch.sin(phase)
-    return torch.complex(real_part, imag_part)
+def spectral_dropout(x, p, training=True):
+    """
+    Drop the magnitude and the phase of every element independently, like `torch.nn.functional.dropout` on each
+    (kept phases are scaled by `1 / (1 - p)` too), with both masks drawn at once and the result built by one `polar`.
+    Returns `x` itself when there is nothing to drop.
+    """
+    if not training or p == 0:
+        return x
+    if p == 1:
+        return torch.zeros_like(x)
+
+    masks = torch.empty((2,) + x.shape, device=x.device, dtype=x.real.dtype).bernoulli_(1 - p).div_(1 - p)
+    return torch.polar(x.abs() * masks[0], x.angle() * masks[1])
 
 
 class SpectralSoftplus(torch.nn.Module):
     def __init__(self, beta, threshold):
         super().__init__()
-        self.softplus = torch.nn.Softplus(beta=beta, threshold=threshold)
+        self.beta = beta
+        self.threshold = threshold
 
     def forward(self, x):
-        return self.softplus(x.real) + 1j * self.softplus(x.imag)
+        # the real and imaginary parts side by side, activated in one call
+        return torch.view_as_complex(torch.nn.functional.softplus(torch.view_as_real(x), self.beta, self.threshold))
 
 
 def warmup_scheduler(optimizer, warmup_steps, min_lr, max_lr):
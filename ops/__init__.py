@@ -1 +1 @@
-from .node_split import exclusive_subgraphs
+from .node_split import ExclusiveSplit, exclusive_split, exclusive_split_batch, exclusive_subgraphs
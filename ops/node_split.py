@@ -1,44 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 import random
-import copy
+from typing import Iterator, Optional
 
-from graph import Graph, Node
+from graph import Graph, Node, copy_node
+from graph.compact import CompactGraph
 
 
-def exclusive_subgraphs(graph: Graph, max_splits: int = 10) -> list:
+@dataclass
+class ExclusiveSplit:
+    """
+    Derived graphs A and B, and for every node of the original graph, the nodes that stand for it in A and in B. 
+    A node that was not split in a graph is stood for by its single copy. 
+    """
+    graph_a: Graph
+    graph_b: Graph
+    splits_a: dict
+    splits_b: dict
+    seed: Optional[int] = None
+
+
+def exclusive_subgraphs(graph: Graph, max_splits: int = 10, rng: Optional[random.Random] = None) -> list:
     """
     Split each node of the graph in up to `max_splits` nodes per node, and return the resulting derived graphs A and B.
     Node splitting is exclusive between the nodes of the derived graphs A and B. 
     This means that each splitted node can only be applied to 1 node between graph A and B, and the other will remain untouched. 
     """
-    graph_a: Graph = copy.deepcopy(graph)
-    graph_b: Graph = copy.deepcopy(graph)
-    
-    original_nodes = graph.get_nodes()
-    nodes_a = graph_a.get_nodes()
-    nodes_b = graph_b.get_nodes()
+    split = exclusive_split(graph, max_splits, rng)
+    return split.graph_a, split.graph_b
+
 
-    for i, _ in enumerate(original_nodes):
-        if random.randint(0, 1) % 2 == 0:
-            split_node(nodes_a[i], max_splits)
+def exclusive_split(graph: Graph, max_splits: int = 10, rng: Optional[random.Random] = None) -> ExclusiveSplit:
+    """
+    Same as `exclusive_subgraphs`, but also return which nodes of A and B each original node became. 
+    The original graph is walked once, and all randomness comes from `rng`, so a seeded `random.Random` gives reproducible pairs. 
+    A and B get graph-local uuids, the same in every process. 
+    """
+    rng = rng if rng is not None else random.Random()
+    nodes = _split_order(graph)
+    copies_a = {node: copy_node(node) for node in nodes}
+    copies_b = {node: copy_node(node) for node in nodes}
+    for node in nodes:
+        for child in node.children:
+            copies_a[node].add_child(copies_a[child])
+            copies_b[node].add_child(copies_b[child])
+
+    graph_a = Graph(copies_a[graph.root])
+    graph_b = Graph(copies_b[graph.root])
+    splits_a = {node: [copy] for node, copy in copies_a.items()}
+    splits_b = {node: [copy] for node, copy in copies_b.items()}
+
+    for node in nodes:
+        if rng.randint(0, 1) % 2 == 0:
+            graph_x, copies_x, splits_x = graph_a, copies_a, splits_a
         else:
-            split_node(nodes_b[i], max_splits)
+            graph_x, copies_x, splits_x = graph_b, copies_b, splits_b
+
+        splits_x[node] = split_node(copies_x[node], max_splits, rng=rng)
+        if node is graph.root:
+            graph_x.root = splits_x[node][0]
     
-    graph_a.unique_indexes()
-    graph_b.unique_indexes()
-    return graph_a, graph_b
+    _number([splits_a[node] for node in nodes])
+    _number([splits_b[node] for node in nodes])
+    return ExclusiveSplit(graph_a, graph_b, splits_a, splits_b)
+
+
+def exclusive_split_batch(graph: Graph, count: int, max_splits: int = 10, seed: Optional[int] = None, processes: Optional[int] = None, compact: bool = False) -> Iterator[ExclusiveSplit]:
+    """
+    Lazily generate `count` exclusive splits of `graph`, walking the graph and building its adjacency only once. 
+    Every pair gets its own seed drawn from `seed`, and is identical to `exclusive_split` with `random.Random(pair.seed)`, 
+    uuids included. 
+
+    With `compact`, pairs are `CompactGraph`s and the split maps go from node index to node indexes. 
+    Compact pairs can be generated in a pool of `processes` workers, since they do not pickle linked `Node`s. 
+    """
+    if processes is not None and not compact:
+        raise ValueError('only compact pairs can be generated in worker processes')
+
+    return _generate_splits(graph, count, max_splits, seed, processes, compact)
+
+
+def _generate_splits(graph: Graph, count: int, max_splits: int, seed: Optional[int], processes: Optional[int], compact: bool) -> Iterator[ExclusiveSplit]:
+    base = _SplitBase(graph)
+    master = random.Random(seed)
+    seeds = [master.getrandbits(64) for _ in range(count)]
+
+    if processes is None:
+        build = base.compact_split if compact else base.split
+        for pair_seed in seeds:
+            yield build(pair_seed, max_splits)
+        return
+
+    base.nodes = None
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_split_worker, initargs=(base,)) as executor:
+        yield from executor.map(_compact_split, seeds, [max_splits] * count, chunksize=max(1, count // (4 * processes)))
+
+
+class _SplitBase:
+    """
+    Node order and index adjacency of a graph, shared by all the pairs generated from it. 
+    A pair is drawn with the same random calls as `exclusive_split`, and every split node becomes a set of twins 
+    connected to all the copies of its parents and children, which is what repeated `split_node` calls produce. 
+    """
+    def __init__(self, graph: Graph) -> None:
+        self.nodes = _split_order(graph)
+        indexes = {node: i for i, node in enumerate(self.nodes)}
+        self.children = [[indexes[n] for n in node.children] for node in self.nodes]
+        self.root = indexes[graph.root]
+        self.operations = [getattr(node, 'operation', None) for node in self.nodes]
+        self.node_type = type(graph.root)
+
+    def draw(self, seed: int, max_splits: int) -> tuple:
+        rng = random.Random(seed)
+        sizes_a, sizes_b = [1] * len(self.children), [1] * len(self.children)
+        for i in range(len(self.children)):
+            sizes = sizes_a if rng.randint(0, 1) % 2 == 0 else sizes_b
+            sizes[i] = int(rng.random() * max_splits) + 1
+
+        return sizes_a, sizes_b
+
+    def split(self, seed: int, max_splits: int) -> ExclusiveSplit:
+        sizes_a, sizes_b = self.draw(seed, max_splits)
+        graph_a, splits_a = self._build(sizes_a)
+        graph_b, splits_b = self._build(sizes_b)
+        return ExclusiveSplit(graph_a, graph_b, splits_a, splits_b, seed)
+
+    def compact_split(self, seed: int, max_splits: int) -> ExclusiveSplit:
+        sizes_a, sizes_b = self.draw(seed, max_splits)
+        graph_a, splits_a = self._build_compact(sizes_a)
+        graph_b, splits_b = self._build_compact(sizes_b)
+        return ExclusiveSplit(graph_a, graph_b, splits_a, splits_b, seed)
+
+    def _build(self, sizes: list) -> tuple:
+        copies = [[copy_node(node) for _ in range(size)] for node, size in zip(self.nodes, sizes)]
+        for i, children in enumerate(self.children):
+            for child in children:
+                for copy in copies[i]:
+                    for twin in copies[child]:
+                        copy.add_child(twin)
+
+        _number(copies)
+        return Graph(copies[self.root][0]), {node: copy for node, copy in zip(self.nodes, copies)}
+
+    def _build_compact(self, sizes: list) -> tuple:
+        starts = [0]
+        for size in sizes:
+            starts.append(starts[-1] + size)
+
+        edges = [
+            (copy, twin)
+            for i, children in enumerate(self.children)
+            for child in children
+            for copy in range(starts[i], starts[i + 1])
+            for twin in range(starts[child], starts[child + 1])
+        ]
+        graph = CompactGraph.from_edges(
+            uuids=range(starts[-1]),
+            edges=edges,
+            root=starts[self.root],
+            operations=[operation for operation, size in zip(self.operations, sizes) for _ in range(size)],
+            node_type=self.node_type,
+        )
+        return graph, {i: list(range(starts[i], starts[i + 1])) for i in range(len(sizes))}
+
+
+def _split_order(graph: Graph) -> list:
+    """
+    Nodes of `graph` by uuid: unlike `get_nodes`, the order does not depend on how sets of nodes iterate in this process. 
+    """
+    return sorted(graph.get_nodes(), key=lambda node: node.uuid)
+
+
+def _number(copies: list) -> None:
+    """
+    Give the copies of every original node consecutive uuids from 0, node after node, like the indexes of `_build_compact`. 
+    """
+    nodes = [copy for group in copies for copy in group]
+    for i, node in enumerate(nodes):
+        node.uuid = str(i)
+
+    # node hashes depend on uuids, so the sets holding the renumbered nodes must be rebuilt
+    for node in nodes:
+        node.children = set(node.children)
+        node.parents = set(node.parents)
+
+
+_split_worker_base: Optional[_SplitBase] = None
+
+
+def _init_split_worker(base: _SplitBase) -> None:
+    global _split_worker_base
+    _split_worker_base = base
+
+
+def _compact_split(seed: int, max_splits: int) -> ExclusiveSplit:
+    return _split_worker_base.compact_split(seed, max_splits)
 
 
-def split_node(node: Node, max_splits, allow_interconnectivity=False) -> list:
+def split_node(node: Node, max_splits, allow_interconnectivity=False, rng=random) -> list:
     """
     Split a node in up to `max_splits` nodes, and return the splits. 
+    Splits keep the type and attributes of the node, but not its uuid. 
     This operation mutates the graph in place. 
     """
-    split_size = int(random.random() * max_splits) + 1
-    splits = [Node() for _ in range(split_size)]
+    split_size = int(rng.random() * max_splits) + 1
+    splits = [copy_node(node) for _ in range(split_size)]
 
     for i, split in enumerate(splits):
         if allow_interconnectivity:
-            inter_children = random.sample(splits[:i] + splits[i+1:], random.randint(0, len(splits) - 1))
+            inter_children = rng.sample(splits[:i] + splits[i+1:], rng.randint(0, len(splits) - 1))
             for to_add in inter_children:
                 split.add_child(to_add)
         
@@ -1,5 +1,11 @@
+from array import array
+import itertools
+from typing import Optional
+
 import torch
 from graph import Graph
+from graph.binary import read_binary, write_binary
+from graph.compact import CompactGraph
 from graph.torch import ComputationNode
 
 
@@ -22,10 +28,90 @@ def computation_graph(output_tensor: torch.Tensor) -> Graph:
             else:
                 parent = ComputationNode(parent_fn.name())
                 last_root = parent
-                visited[fn] = node
+                visited[parent_fn] = parent
                 parent.add_child(node)
                 stack.append((parent_fn, parent))
 
     root = ComputationNode('root')
     root.add_child(last_root)
     return Graph(root=root)
+
+
+def compact_computation_graph(output_tensor: torch.Tensor, path: Optional[str] = None) -> CompactGraph:
+    """
+    Trace the autograd graph of `output_tensor` into a `CompactGraph`, with the same 'leaf' and 'root' nodes as `computation_graph`. 
+    Only interned operation names and integer edges are recorded. 
+    Autograd functions are keyed by their Python wrappers, which are kept until the walk ends: 
+    autograd only holds them weakly, so the `id` of a released wrapper could be reused by the next one. 
+    With `path`, the result is written in the binary graph format and returned memory-mapped from disk. 
+    """
+    pool = {'leaf': 0}
+    operation_ids = array('q', [0])
+    sources, targets = array('q'), array('q')
+    indexes = {output_tensor.grad_fn: 0}
+    stack = [(output_tensor.grad_fn, 0)]
+    last_root = None
+
+    while stack:
+        fn, index = stack.pop()
+
+        # ops taking the same input twice, like `y * y`, list its function twice but get a single edge
+        seen = set()
+        for parent_fn, _ in fn.next_functions:
+            if parent_fn is None:
+                continue
+
+            parent = indexes.get(parent_fn)
+            if parent is None:
+                parent = indexes[parent_fn] = len(operation_ids)
+                operation_ids.append(pool.setdefault(parent_fn.name(), len(pool)))
+                stack.append((parent_fn, parent))
+
+            if parent not in seen:
+                seen.add(parent)
+                sources.append(parent)
+                targets.append(index)
+            last_root = parent
+
+    del indexes
+    root = len(operation_ids)
+    operation_ids.append(pool.setdefault('root', len(pool)))
+    if last_root is not None:
+        sources.append(root)
+        targets.append(last_root)
+
+    graph = CompactGraph.from_edge_arrays(range(len(operation_ids)), sources, targets, root, list(pool), operation_ids, ComputationNode)
+    if path is None:
+        return graph
+
+    write_binary(graph, path)
+    del graph
+    return read_binary(path)
+
+
+def meta_computation_graph(model: torch.nn.Module, *inputs, compact: bool = False, **kwargs):
+    """
+    Trace `model` without allocating activations or touching its weights: 
+    parameters, buffers and tensor inputs are replaced by meta tensors of the same shape, dtype and `requires_grad`, 
+    and the forward pass runs through `torch.func.functional_call`. Meta tensors still record autograd functions, 
+    so the result is the graph `computation_graph` (or `compact_computation_graph` with `compact`) gives for a real forward pass. 
+    """
+    state = {
+        name: _to_meta(tensor)
+        for name, tensor in itertools.chain(model.named_parameters(), model.named_buffers())
+    }
+    args = tuple(_to_meta(x) if isinstance(x, torch.Tensor) else x for x in inputs)
+    output = torch.func.functional_call(model, state, args, kwargs)
+
+    if compact:
+        return compact_computation_graph(output)
+
+    return computation_graph(output)
+
+
+def _to_meta(tensor: torch.Tensor) -> torch.Tensor:
+    meta = torch.empty_like(tensor, device='meta')
+    if tensor.requires_grad:
+        meta.requires_grad_()
+
+    return meta
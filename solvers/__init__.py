@@ -1,9 +1,26 @@
 from graph import Graph, NodeMapping
 
 
+SOLVERS = {}
+
+
+def register_solver(name: str):
+    """
+    Register a solver class under `name`, so benchmarks can find it. 
+    """
+    def register(solver: type) -> type:
+        SOLVERS[name] = solver
+        return solver
+
+    return register
+
+
 class SharedGraphSolver:
     """
     Base class for implementing solvers. 
     """
-    def solve(self, graph1: Graph, graph2: Graph) -> set[NodeMapping]:
+    def solve(self, graph1: Graph, graph2: Graph) -> list[NodeMapping]:
         raise NotImplementedError()
+
+
+from . import example, multilevel, signature  # noqa: E402 register the built-in solvers
@@ -1,7 +1,8 @@
 from graph import Graph, NodeMapping
-from . import SharedGraphSolver
+from . import SharedGraphSolver, register_solver
 
 
+@register_solver('example')
 class ExampleSolver(SharedGraphSolver):
-    def solve(self, graph1: Graph, graph2: Graph) -> Graph:
-        return {}
+    def solve(self, graph1: Graph, graph2: Graph) -> list[NodeMapping]:
+        return []
@@ -0,0 +1,42 @@
+from graph import Graph, NodeMapping
+from graph.coarsening import Hierarchy, coarsen
+from . import SOLVERS, SharedGraphSolver, register_solver
+
+
+@register_solver('multilevel')
+class MultilevelSolver(SharedGraphSolver):
+    """
+    Solve on the coarsest graphs of `coarsen` with another registered solver,
+    then project the mappings back to the roots of the original graphs.
+
+    Merging siblings first undoes node splits, so the coarse graphs are close to the graph both were derived from
+    and much smaller than either.
+    """
+    def __init__(self, solver: str = 'signature', steps=('siblings', 'chains'), labelled: bool = False) -> None:
+        self.solver = solver
+        self.steps = steps
+        self.labelled = labelled
+
+    def solve(self, graph1: Graph, graph2: Graph) -> list[NodeMapping]:
+        hierarchy1 = coarsen(graph1, self.steps, self.labelled)
+        hierarchy2 = coarsen(graph2, self.steps, self.labelled)
+        mappings = SOLVERS[self.solver]().solve(hierarchy1.coarsest, hierarchy2.coarsest)
+
+        return self.refine(mappings, hierarchy1, hierarchy2)
+
+    def refine(self, mappings: list[NodeMapping], hierarchy1: Hierarchy, hierarchy2: Hierarchy) -> list[NodeMapping]:
+        """
+        Replace every coarse node of `mappings` by the original roots merged into it.
+        """
+        members1 = hierarchy1.partition()
+        members2 = hierarchy2.partition()
+
+        refined = []
+        for mapping in mappings:
+            fine = NodeMapping()
+            fine.left.update(node for coarse in mapping.left for node in members1[coarse] if not node.parents)
+            fine.right.update(node for coarse in mapping.right for node in members2[coarse] if not node.parents)
+            if fine.left and fine.right:
+                refined.append(fine)
+
+        return refined
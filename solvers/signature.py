@@ -0,0 +1,123 @@
+import time
+from typing import Optional
+
+from graph import Graph, NodeMapping
+from . import SharedGraphSolver, register_solver
+
+
+@register_solver('signature')
+class SignatureSolver(SharedGraphSolver):
+    """
+    Map groups of roots by giving every node a signature refined from the leaf upward.
+
+    A node's signature interns the set (not the multiset) of its children's signatures,
+    so the splits of a node, which share the parents and children of the original, get the signature of the original,
+    and splitting never changes the signature of anything above it.
+    Roots of both graphs with the same signature form one group.
+    Roots left without a counterpart are grouped with union-find over the signatures of their children.
+    Runs in O(V+E) hashing work.
+    """
+    def __init__(self, time_budget: Optional[float] = None, labelled: bool = False) -> None:
+        self.time_budget = time_budget
+        self.labelled = labelled
+
+    def solve(self, graph1: Graph, graph2: Graph) -> list[NodeMapping]:
+        """
+        With a `time_budget` in seconds, return the mappings found when the budget runs out:
+        signatures are computed children first, so the ones computed by then are final,
+        and the roots that have one are still matched.
+        """
+        deadline = None if self.time_budget is None else time.monotonic() + self.time_budget
+        table = {}
+        signatures1, signatures2 = {}, {}
+        try:
+            self.signatures(graph1, table, deadline, signatures1)
+            self.signatures(graph2, table, deadline, signatures2)
+        except TimeoutError:
+            pass
+
+        roots1 = _roots_by_signature(graph1, signatures1)
+        roots2 = _roots_by_signature(graph2, signatures2)
+
+        mappings = []
+        for signature, left in roots1.items():
+            right = roots2.get(signature)
+            if right:
+                mappings.append(_mapping(left, right))
+
+        unmatched1 = [root for signature, roots in roots1.items() if signature not in roots2 for root in roots]
+        unmatched2 = [root for signature, roots in roots2.items() if signature not in roots1 for root in roots]
+        if unmatched1 and unmatched2:
+            try:
+                mappings.extend(self.group_unmatched(unmatched1, unmatched2, signatures1, signatures2, deadline))
+            except TimeoutError:
+                pass
+
+        return mappings
+
+    def signatures(self, graph: Graph, table: dict, deadline: Optional[float] = None, signatures: Optional[dict] = None) -> dict:
+        """
+        Signature of every node that reaches the leaf, interned in `table` so they compare across graphs.
+        They are added to `signatures` when given, which keeps the ones computed before a timeout.
+        """
+        signatures = {} if signatures is None else signatures
+        for i, node in enumerate(graph.reverse_topological_order()):
+            if deadline is not None and not i % 1024 and time.monotonic() > deadline:
+                raise TimeoutError()
+
+            label = getattr(node, 'operation', None) if self.labelled else None
+            key = (label, frozenset(signatures[child] for child in node.children if child in signatures))
+            signatures[node] = table.setdefault(key, len(table))
+
+        return signatures
+
+    def group_unmatched(self, roots1: list, roots2: list, signatures1: dict, signatures2: dict, deadline: Optional[float] = None) -> list[NodeMapping]:
+        """
+        Union roots of either graph that share a child signature, and map each group that spans both graphs.
+        """
+        roots = [(1, root) for root in roots1] + [(2, root) for root in roots2]
+        leader = list(range(len(roots)))
+
+        def find(i):
+            while leader[i] != i:
+                leader[i] = leader[leader[i]]
+                i = leader[i]
+            return i
+
+        first_with = {}
+        for i, (side, root) in enumerate(roots):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError()
+
+            signatures = signatures1 if side == 1 else signatures2
+            for child in root.children:
+                if child not in signatures:
+                    continue
+                j = first_with.setdefault(signatures[child], i)
+                leader[find(i)] = find(j)
+
+        groups = {}
+        for i, (side, root) in enumerate(roots):
+            groups.setdefault(find(i), ([], []))[side - 1].append(root)
+
+        return [
+            _mapping(left, right)
+            for left, right in groups.values()
+            if left and right
+        ]
+
+
+def _roots_by_signature(graph: Graph, signatures: dict) -> dict:
+    roots = {}
+    for node in graph.get_nodes():
+        if not node.parents and node in signatures:
+            roots.setdefault(signatures[node], []).append(node)
+
+    return roots
+
+
+def _mapping(left: list, right: list) -> NodeMapping:
+    mapping = NodeMapping()
+    mapping.left.update(left)
+    mapping.right.update(right)
+    return mapping
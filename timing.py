@@ -0,0 +1,12 @@
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def timed(results: dict, key: str):
+    """
+    Store the wall time of the block in `results[key]`, in seconds.
+    """
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start